@@ -0,0 +1,271 @@
+
+import os
+import array
+import heapq
+import random
+import hashlib
+import struct
+import unittest
+import tempfile
+
+from graph import Graph
+from dijkstra import dijkstra, _relax, _build_path
+
+INFINITY = float('inf')
+
+
+def _get_fingerprint(graph):
+    """:return digest of arcs and their marks, it changes with any mark"""
+    graph = graph.freeze()
+    offsets, targets, _, _, _ = graph.get_csr_arrays()
+    digest = hashlib.sha1()
+
+    for values in (offsets, targets, graph.get_mark_collection().values):
+        values = values[:]  # mapped arrays are copied into array.array
+        digest.update(values.tostring() if isinstance(values, array.array) else repr(values))
+
+    return digest.digest()
+
+
+def a_star(graph, source, target, heuristic=None):
+    """Dijkstra search towards the target ordered by mark + lower bound of the rest of the path
+
+    :param heuristic: function vertex -> lower bound of distance from the vertex to the target, it has to be
+        consistent (h(u) <= w(u, v) + h(v)); INFINITY means the target is unreachable. None - plain Dijkstra
+    :return (distance, path from source to target), (None, []) if target isn't reachable
+    """
+    assert isinstance(graph, Graph)
+    assert 0 <= source < len(graph)
+    assert 0 <= target < len(graph)
+
+    if heuristic is None:
+        heuristic = lambda vertex: 0
+
+    marks = [None] * len(graph)
+    prev_vertex_marks = [None] * len(graph)
+    discovered = [False] * len(graph)
+
+    marks[source] = 0
+    queue = [(heuristic(source), source)]
+
+    while queue:
+        _, v_from = heapq.heappop(queue)
+        if discovered[v_from]:
+            continue  # stale queue entry
+
+        if v_from == target:
+            return marks[target], _build_path(prev_vertex_marks, target)[::-1]
+
+        discovered[v_from] = True
+        for v_to, weight in graph.iter_arc_marks(v_from):
+            if not discovered[v_to] and _relax(marks, prev_vertex_marks, v_from, v_to, weight):
+                estimate = heuristic(v_to)
+                if estimate < INFINITY:
+                    heapq.heappush(queue, (marks[v_to] + estimate, v_to))
+
+    return None, []
+
+
+class AltIndex(object):
+    """landmark distances for A* lower bounds by triangle inequality (ALT)
+
+    For a landmark L: d(v, t) >= d(L, t) - d(L, v) and d(v, t) >= d(v, L) - d(t, L).
+    Distances are kept in float arrays, one row of |V| items per landmark and direction,
+    INFINITY marks unreachable vertices. The index keeps a fingerprint of the arc marks it was built for,
+    so it isn't used once the graph is changed.
+    """
+    MAGIC = 'ALTI'
+    VERSION = 2
+    _HEADER = struct.Struct('<4sHqqq20s')
+
+    def __init__(self, vertex_count, arc_count, fingerprint, landmarks, forward_marks, backward_marks):
+        assert len(forward_marks) == len(backward_marks) == len(landmarks) * vertex_count
+        self._vertex_count = vertex_count
+        self._arc_count = arc_count
+        self._fingerprint = fingerprint
+        self._checked_version = None  # last graph version found to match the fingerprint
+        self._landmarks = landmarks
+        self._forward_marks = forward_marks  # d(L, v) at [landmark_idx * |V| + v]
+        self._backward_marks = backward_marks  # d(v, L)
+
+    @property
+    def landmarks(self):
+        return list(self._landmarks)
+
+    @classmethod
+    def build(cls, graph, landmark_count, first_landmark=0):
+        """pick landmarks one by one as the vertex farthest from already picked ones, then run
+        forward and reverse Dijkstra from each of them"""
+        assert isinstance(graph, Graph)
+        vertex_count = len(graph)
+        landmark_count = min(landmark_count, vertex_count)
+
+        landmarks = array.array('l')
+        forward_marks, backward_marks = array.array('d'), array.array('d')
+        min_landmark_marks = [INFINITY] * vertex_count  # distance to the closest landmark picked
+        landmark = first_landmark
+
+        for _ in xrange(landmark_count):
+            landmarks.append(landmark)
+
+            marks, _ = dijkstra(graph, landmark)
+            forward_marks.extend(mark if mark is not None else INFINITY for mark in marks)
+            marks, _ = dijkstra(graph, landmark, reverse=True)
+            backward_marks.extend(mark if mark is not None else INFINITY for mark in marks)
+
+            row = len(landmarks) - 1
+            for vertex in xrange(vertex_count):
+                mark = forward_marks[row * vertex_count + vertex]
+                if mark < min_landmark_marks[vertex]:
+                    min_landmark_marks[vertex] = mark
+
+            # next landmark is the farthest reachable vertex, unreachable ones are picked first
+            landmark = max(xrange(vertex_count), key=min_landmark_marks.__getitem__)
+            if min_landmark_marks[landmark] == 0:
+                break  # all vertices are landmarks
+
+        return cls(vertex_count, graph.arc_count, _get_fingerprint(graph), landmarks, forward_marks, backward_marks)
+
+    def is_built_for(self, graph):
+        """:return whether the index is built for the graph with its current marks"""
+        if graph.version == self._checked_version:
+            return True
+        if len(graph) != self._vertex_count or graph.arc_count != self._arc_count:
+            return False
+        if _get_fingerprint(graph) != self._fingerprint:
+            return False
+
+        self._checked_version = graph.version  # versions are never repeated
+        return True
+
+    def get_lower_bound(self, vertex, target):
+        vertex_count = self._vertex_count
+        forward_marks, backward_marks = self._forward_marks, self._backward_marks
+        lower_bound = 0
+
+        for offset in xrange(0, len(forward_marks), vertex_count):
+            to_target, to_vertex = forward_marks[offset + target], forward_marks[offset + vertex]
+            if to_target != to_vertex:  # also skips INFINITY - INFINITY
+                lower_bound = max(lower_bound, to_target - to_vertex)
+
+            from_vertex, from_target = backward_marks[offset + vertex], backward_marks[offset + target]
+            if from_vertex != from_target:
+                lower_bound = max(lower_bound, from_vertex - from_target)
+
+        return lower_bound
+
+    def get_heuristic(self, target):
+        """:return heuristic function for a_star()"""
+        return lambda vertex: self.get_lower_bound(vertex, target)
+
+    def shortest_path(self, graph, source, target):
+        """:return (distance, path) as a_star() with landmark lower bounds"""
+        assert self.is_built_for(graph), "Index is built for another graph or marks"
+        return a_star(graph, source, target, self.get_heuristic(target))
+
+    def save(self, path):
+        with open(path, 'wb') as stream:
+            stream.write(self._HEADER.pack(self.MAGIC, self.VERSION, self._vertex_count, self._arc_count,
+                                           len(self._landmarks), self._fingerprint))
+            for values in (self._landmarks, self._forward_marks, self._backward_marks):
+                values.tofile(stream)
+
+    @classmethod
+    def load(cls, path, graph=None):
+        """:param graph: graph the index is going to be used with, checked to be the one it is built for"""
+        with open(path, 'rb') as stream:
+            header = stream.read(cls._HEADER.size)
+            if len(header) != cls._HEADER.size:
+                raise ValueError('%s is not an ALT index of version %d' % (path, cls.VERSION))
+            magic, version, vertex_count, arc_count, landmark_count, fingerprint = cls._HEADER.unpack(header)
+            if magic != cls.MAGIC or version != cls.VERSION:
+                raise ValueError('%s is not an ALT index of version %d' % (path, cls.VERSION))
+
+            landmarks, forward_marks, backward_marks = array.array('l'), array.array('d'), array.array('d')
+            landmarks.fromfile(stream, landmark_count)
+            forward_marks.fromfile(stream, landmark_count * vertex_count)
+            backward_marks.fromfile(stream, landmark_count * vertex_count)
+
+        index = cls(vertex_count, arc_count, fingerprint, landmarks, forward_marks, backward_marks)
+        if graph is not None and not index.is_built_for(graph):
+            raise ValueError('%s is built for another graph or marks' % path)
+
+        return index
+
+
+class TestCase(unittest.TestCase):
+    def test_simple(self):
+        graph = Graph(6)
+
+        graph.add(0, 1, 3)
+        graph.add(0, 2, 15)
+        graph.add(1, 2, 7)
+        graph.add(1, 3, 2)
+        graph.add(2, 4, 5)
+        graph.add(3, 2, 1)
+        graph.add(3, 5, 20)
+        graph.add(4, 3, 3)
+        graph.add(4, 5, 4)
+
+        distance, path = a_star(graph, 0, 5)
+
+        self.assertEqual(15, distance)
+        self.assertListEqual([0, 1, 3, 2, 4, 5], path)
+        self.assertEqual((None, []), a_star(graph, 5, 0))
+
+    def test_alt(self):
+        rnd = random.Random(5)
+        graph = Graph(150)
+        for _ in xrange(600):
+            graph.add(rnd.randrange(150), rnd.randrange(150), rnd.randint(1, 40))
+
+        index = AltIndex.build(graph, 4)
+        self.assertEqual(4, len(index.landmarks))
+
+        handle, path = tempfile.mkstemp(suffix='.alt')
+        os.close(handle)
+        try:
+            index.save(path)
+            loaded_index = AltIndex.load(path, graph)
+        finally:
+            os.remove(path)
+
+        for source in xrange(0, 150, 11):
+            marks, _ = dijkstra(graph, source)
+            for target in xrange(0, 150, 7):
+                for checked_index in (index, loaded_index):
+                    self.assertLessEqual(checked_index.get_lower_bound(source, target),
+                                         marks[target] if marks[target] is not None else INFINITY)
+
+                    distance, path = checked_index.shortest_path(graph, source, target)
+                    self.assertEqual(marks[target], distance)
+
+    def test_alt_changed_graph(self):
+        graph = Graph(4)
+
+        graph.add(0, 1, 5)
+        graph.add(1, 2, 5)
+        graph.add(0, 3, 1)
+        graph.add(3, 2, 20)
+
+        index = AltIndex.build(graph, 2)
+        self.assertTrue(index.is_built_for(graph))
+        self.assertEqual((10, [0, 1, 2]), index.shortest_path(graph, 0, 2))
+
+        handle, path = tempfile.mkstemp(suffix='.alt')
+        os.close(handle)
+        try:
+            index.save(path)
+
+            graph.set_mark(3, 2, 1)  # bounds of the index overestimate now
+
+            self.assertFalse(index.is_built_for(graph))
+            self.assertRaises(AssertionError, index.shortest_path, graph, 0, 2)
+            self.assertRaises(ValueError, AltIndex.load, path, graph)
+            self.assertEqual((2, [0, 3, 2]), AltIndex.build(graph, 2).shortest_path(graph, 0, 2))
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
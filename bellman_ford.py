@@ -1,9 +1,21 @@
 
+import random
 import unittest
-from graph import Graph
+import collections
+from graph import Graph, UndirectedGraph
+import graph_helper
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 def bellman_ford(graph, source):
+    """
+    :return (marks, prev_vertex_marks, negative_cycle) - vertices of a negative cycle reachable from the source
+        in arc order, empty list if there is no such cycle
+    """
     assert isinstance(graph, Graph)
     assert 0 <= source < len(graph)
 
@@ -11,30 +23,185 @@ def bellman_ford(graph, source):
     prev_vertex_marks = [None] * len(graph)
 
     marks[source] = 0
-    last_relaxed_vertices = None
+    last_relaxed_vertex = None
 
     for iter_idx in xrange(len(graph)):  # |V| - to find out negative cycles
-        last_relaxed_vertices = []  # clear relaxed vertices on the prev. step
+        last_relaxed_vertex = None
 
         for v_from in xrange(len(graph)):   # double 'for' - |E|
             if marks[v_from] is None:  # nothing to relax
                 continue
 
-            for v_to in graph[v_from]:
-                _relax(marks, prev_vertex_marks, v_from, v_to, graph.get_mark(v_from, v_to), last_relaxed_vertices)
+            for v_to, weight in graph.iter_arc_marks(v_from):
+                if _relax(marks, prev_vertex_marks, v_from, v_to, weight):
+                    last_relaxed_vertex = v_to
+
+        if last_relaxed_vertex is None:  # marks are final
+            break
 
     # assert all(map(lambda x: isinstance(x, (int, long)), marks)), "Graph has stand-alone vertices"
 
-    # relaxed vertices are vertices on the negative cycle if not empty
-    return marks, prev_vertex_marks, last_relaxed_vertices
+    # relaxation on the |V|-th pass means a negative cycle
+    if last_relaxed_vertex is None:
+        return marks, prev_vertex_marks, []
+    return marks, prev_vertex_marks, _find_cycle(prev_vertex_marks, last_relaxed_vertex)
+
+
+def spfa(graph, source):
+    """queue-based Bellman-Ford (SPFA) with subtree disassembly (Tarjan)
+
+    Vertices are scanned in FIFO order only while their marks change. When a mark decreases, the subtree of
+    the vertex in the shortest paths tree is taken out of the tree: marks of its vertices are going to decrease
+    too, so they aren't scanned until relaxed again. A relaxed arc coming from that subtree closes a negative
+    cycle, it is found as soon as it appears in the tree.
+
+    :param source: None for a virtual source with zero arcs to all vertices (e.g. for Johnson potentials)
+    :return (marks, prev_vertex_marks, negative_cycle) as bellman_ford does
+    """
+    assert isinstance(graph, Graph)
+    assert source is None or 0 <= source < len(graph)
+
+    marks = [None] * len(graph)
+    prev_vertex_marks = [None] * len(graph)
+    children = [[] for _ in xrange(len(graph))]  # shortest paths tree, may keep vertices that left the subtree
+    is_active = [False] * len(graph)  # vertex is in the tree, its mark is the path length over tree arcs
+    is_queued = [False] * len(graph)
+
+    roots = xrange(len(graph)) if source is None else (source,)
+    for root in roots:
+        marks[root] = 0
+        is_active[root] = is_queued[root] = True
+    queue = collections.deque(roots)
+
+    while queue:
+        v_from = queue.popleft()
+        is_queued[v_from] = False
+        if not is_active[v_from]:
+            continue  # mark is going to decrease, vertex will be scanned again
+
+        v_mark = marks[v_from]
+        for v_to, weight in graph.iter_arc_marks(v_from):
+            new_mark = v_mark + weight
+            if marks[v_to] is not None and marks[v_to] <= new_mark:
+                continue
+
+            if is_active[v_to] and _disassemble_subtree(v_to, v_from, prev_vertex_marks, children, is_active):
+                cycle = [v_from]
+                while cycle[-1] != v_to:
+                    cycle.append(prev_vertex_marks[cycle[-1]])
+                return marks, prev_vertex_marks, _normalize_cycle(cycle[::-1])
+
+            marks[v_to] = new_mark
+            prev_vertex_marks[v_to] = v_from
+            children[v_from].append(v_to)
+            is_active[v_to] = True
+
+            if not is_queued[v_to]:
+                is_queued[v_to] = True
+                queue.append(v_to)
+
+    return marks, prev_vertex_marks, []
+
+
+def vectorized_bellman_ford(graph, source):
+    """Bellman-Ford with every pass done by numpy over arc arrays, needs numpy
+
+    A pass gathers marks[sources] + weights and scatters their minimum into marks[targets], it stops once
+    a pass changes nothing. Negative cycles are rare, the exact one is taken from spfa then.
+
+    :param source: None for a virtual source with zero arcs to all vertices, as for spfa
+    :return (marks, prev_vertex_marks, negative_cycle) as bellman_ford does
+    """
+    assert numpy is not None, "numpy is required"
+    assert isinstance(graph, Graph)
+    assert source is None or 0 <= source < len(graph)
+
+    sources, targets, weights = graph_helper.get_arc_arrays(graph)
+    is_integer = numpy.issubdtype(weights.dtype, numpy.integer)
+    weights = weights.astype(numpy.float64)
+
+    marks = numpy.full(len(graph), numpy.inf)
+    prev_vertex_marks = numpy.full(len(graph), -1, dtype=numpy.int64)
+    marks[source if source is not None else slice(None)] = 0
+
+    for iter_idx in xrange(len(graph)):  # |V| - to find out negative cycles
+        arc_marks = marks[sources] + weights
+        new_marks = marks.copy()
+        numpy.minimum.at(new_marks, targets, arc_marks)
+
+        is_changed = new_marks < marks
+        if not is_changed.any():
+            break
+
+        # any arc giving the new mark becomes the tree arc
+        relaxed_arcs = numpy.flatnonzero(is_changed[targets] & (arc_marks == new_marks[targets]))
+        prev_vertex_marks[targets[relaxed_arcs]] = sources[relaxed_arcs]
+        marks = new_marks
+    else:
+        return spfa(graph, source)
+
+    marks = [None if mark == numpy.inf else (int(mark) if is_integer else float(mark)) for mark in marks]
+    prev_vertex_marks = [None if vertex < 0 else int(vertex) for vertex in prev_vertex_marks]
+
+    return marks, prev_vertex_marks, []
 
 
-def _relax(marks, prev_vertex_marks, v_from, v_to, weight, last_relaxed_vertices):
+def _disassemble_subtree(root, vertex, prev_vertex_marks, children, is_active):
+    """deactivate descendants of the root, the root itself is re-attached by the caller
+
+    :return True if the vertex is a descendant of the root (a negative cycle), the tree isn't changed then
+    """
+    descendants = []
+    stack = [root]
+
+    while stack:
+        v_from = stack.pop()
+        for v_to in children[v_from]:
+            # children lists are cleaned lazily: skip vertices attached to another parent since then
+            if prev_vertex_marks[v_to] == v_from and is_active[v_to]:
+                if v_to == vertex:
+                    return True
+                descendants.append(v_to)
+                stack.append(v_to)
+
+    if prev_vertex_marks[root] is not None:
+        prev_children = children[prev_vertex_marks[root]]
+        if root in prev_children:
+            prev_children.remove(root)
+    children[root] = []
+
+    for v_to in descendants:
+        is_active[v_to] = False
+        children[v_to] = []
+
+    return False
+
+
+def _find_cycle(prev_vertex_marks, vertex):
+    """:return cycle of predecessors reached from the vertex, in arc order"""
+    for _ in xrange(len(prev_vertex_marks)):  # long enough to get on the cycle
+        vertex = prev_vertex_marks[vertex]
+
+    cycle = [vertex]
+    while prev_vertex_marks[cycle[-1]] != vertex:
+        cycle.append(prev_vertex_marks[cycle[-1]])
+
+    return _normalize_cycle(cycle[::-1])
+
+
+def _normalize_cycle(cycle):
+    """rotate cycle to start from its min vertex"""
+    start_idx = cycle.index(min(cycle))
+    return cycle[start_idx:] + cycle[:start_idx]
+
+
+def _relax(marks, prev_vertex_marks, v_from, v_to, weight):
     new_mark = marks[v_from] + weight
     if marks[v_to] is None or marks[v_to] > new_mark:
         marks[v_to] = new_mark
         prev_vertex_marks[v_to] = v_from
-        last_relaxed_vertices.append(v_from)
+        return True
+    return False
 
 
 class TestCase(unittest.TestCase):
@@ -51,10 +218,13 @@ class TestCase(unittest.TestCase):
         graph.add(4, 3, 3)
         graph.add(4, 5, 4)
 
-        marks, prev_vertex_marks, last_relaxed_vertices = bellman_ford(graph, 0)
         expected_marks = [0, 3, 6, 5, 11, 15]
 
-        self.assertListEqual(marks, expected_marks)
+        for search in (bellman_ford, spfa):
+            marks, prev_vertex_marks, negative_cycle = search(graph, 0)
+
+            self.assertListEqual(marks, expected_marks)
+            self.assertListEqual([], negative_cycle)
 
     def test_neg_cycle(self):
         graph = Graph(3)
@@ -63,10 +233,76 @@ class TestCase(unittest.TestCase):
         graph.add(1, 2, -5)
         graph.add(2, 0, -6)
 
-        marks, prev_vertex_marks, neg_cycle_vertices = bellman_ford(graph, 0)
-        expected_neg_cycle_vertices = [0, 1, 2]
+        for search in (bellman_ford, spfa):
+            marks, prev_vertex_marks, neg_cycle_vertices = search(graph, 0)
+            expected_neg_cycle_vertices = [0, 1, 2]
+
+            self.assertListEqual(expected_neg_cycle_vertices, neg_cycle_vertices)
+
+    def test_random(self):
+        rnd = random.Random(41)
+
+        for _ in xrange(30):
+            graph = Graph(30)
+            for _ in xrange(90):
+                graph.add(rnd.randrange(30), rnd.randrange(30), rnd.randint(-4, 20))
+
+            expected_marks, _, expected_cycle = bellman_ford(graph, 0)
+            marks, prev_vertex_marks, negative_cycle = spfa(graph, 0)
+
+            self.assertEqual(bool(expected_cycle), bool(negative_cycle))
+
+            for cycle in (expected_cycle, negative_cycle):
+                if cycle:
+                    self.assertLess(sum(graph.get_mark(v_from, v_to)
+                                        for v_from, v_to in zip(cycle, cycle[1:] + cycle[:1])), 0)
+
+            if not negative_cycle:
+                self.assertListEqual(expected_marks, marks)
+                for v_to, v_from in enumerate(prev_vertex_marks):
+                    if v_from is not None:
+                        self.assertEqual(marks[v_to], marks[v_from] + graph.get_mark(v_from, v_to))
+
+    def test_virtual_source(self):
+        graph = Graph(4)
+
+        graph.add(0, 1, -2)
+        graph.add(1, 2, 3)
+        graph.add(2, 3, -4)
+
+        searches = (spfa, vectorized_bellman_ford) if numpy is not None else (spfa,)
+        for search in searches:
+            self.assertEqual(([0, -2, 0, -4], [None, 0, None, 2], []), search(graph, None))
+
+        graph.add(3, 1, 0)
+        for search in searches:
+            self.assertListEqual([1, 2, 3], search(graph, None)[2])
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_vectorized(self):
+        rnd = random.Random(43)
+
+        for _ in xrange(20):
+            graph = Graph(30)
+            for _ in xrange(90):
+                graph.add(rnd.randrange(30), rnd.randrange(30), rnd.randint(-3, 20))
+
+            expected_marks, _, expected_cycle = bellman_ford(graph, 0)
+            marks, prev_vertex_marks, negative_cycle = vectorized_bellman_ford(graph, 0)
+
+            self.assertEqual(bool(expected_cycle), bool(negative_cycle))
+            if not negative_cycle:
+                self.assertListEqual(expected_marks, marks)
+                for v_to, v_from in enumerate(prev_vertex_marks):
+                    if v_from is not None:
+                        self.assertEqual(marks[v_to], marks[v_from] + graph.get_mark(v_from, v_to))
+
+        graph = UndirectedGraph(3)
+        graph.add(0, 1, 1.5)
+        graph.add(2, 1, 2)
 
-        self.assertListEqual(expected_neg_cycle_vertices, neg_cycle_vertices)
+        for checked_graph in (graph, graph.freeze()):
+            self.assertEqual(([0, 1.5, 3.5], [None, 0, 1], []), vectorized_bellman_ford(checked_graph, 0))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,151 @@
+
+import array
+import bisect
+import random
+import unittest
+import itertools
+import multiprocessing
+
+from graph import Graph, UndirectedGraph, VERTEX_TYPECODE
+import parallel_dijkstra
+
+from disjoint_set import DisjointSet
+from kruskal import kruskal
+
+_worker_arrays = None  # (offsets, targets, marks) of the graph mapped by a pool worker
+_worker_components = None  # component of every vertex, shared with the parent process
+
+
+def _init_worker(graph, components):
+    global _worker_arrays, _worker_components
+    offsets, targets, _, _, _ = graph.get_csr_arrays()
+    _worker_arrays = offsets, targets, graph.get_mark_collection().values
+    _worker_components = components
+
+
+def _find_min_edges(arrays, components, vertex_start, vertex_stop):
+    """:return dict component -> (weight, arc id) of the lightest arc leaving it among arcs of the vertices"""
+    offsets, targets, marks = arrays
+    min_edges = {}
+
+    # slices copy arcs of the chunk only, mapped arrays are read without copying the rest
+    offsets = offsets[vertex_start:vertex_stop + 1]
+    arc_start, arc_stop = offsets[0], offsets[-1]
+    targets, marks = targets[arc_start:arc_stop], marks[arc_start:arc_stop]
+
+    for v_from in xrange(vertex_start, vertex_stop):
+        component_from = components[v_from]
+        first_arc_id, last_arc_id = offsets[v_from - vertex_start], offsets[v_from - vertex_start + 1]
+
+        for arc_id, v_to, mark in itertools.izip(xrange(first_arc_id, last_arc_id),
+                                                 targets[first_arc_id - arc_start:last_arc_id - arc_start],
+                                                 marks[first_arc_id - arc_start:last_arc_id - arc_start]):
+            component_to = components[v_to]
+            if component_from == component_to:
+                continue
+
+            # ties are broken by arc id, so chosen arcs never make a cycle
+            edge = (mark, arc_id)
+            for component in (component_from, component_to):
+                min_edge = min_edges.get(component)
+                if min_edge is None or min_edge > edge:
+                    min_edges[component] = edge
+
+    return min_edges
+
+
+def _find_worker_min_edges(task):
+    vertex_start, vertex_stop = task
+    return _find_min_edges(_worker_arrays, _worker_components, vertex_start, vertex_stop)
+
+
+def _join_components(offsets, targets, find_chunk_min_edges):
+    """run Boruvka phases, find_chunk_min_edges(components) returns _find_min_edges results of all chunks
+
+    :return (weight, edges) as prim does
+    """
+    vertex_count = len(offsets) - 1
+    vertex_sets = DisjointSet(vertex_count)
+    components = array.array(VERTEX_TYPECODE, xrange(vertex_count))
+    min_tree_weight = 0
+    tree_edges = []
+
+    while True:
+        min_edges = {}
+        for edges in find_chunk_min_edges(components):
+            for component, edge in edges.iteritems():
+                if component not in min_edges or min_edges[component] > edge:
+                    min_edges[component] = edge
+
+        if not min_edges:
+            break
+
+        for weight, arc_id in set(min_edges.itervalues()):
+            v_from, v_to = bisect.bisect_right(offsets, arc_id) - 1, targets[arc_id]
+            if vertex_sets.union(v_from, v_to):
+                tree_edges.append((v_from, v_to))
+                min_tree_weight += weight
+
+        components = array.array(VERTEX_TYPECODE, (vertex_sets.find(vertex) for vertex in xrange(vertex_count)))
+
+    return min_tree_weight, tree_edges
+
+
+def boruvka(graph, process_count=1, chunk_count=None):
+    """Boruvka minimum spanning forest, arcs of a directed graph are taken as edges
+
+    Every phase finds the lightest edge leaving each component and joins components by them, so there are
+    log(|V|) phases at most. Searches over vertex chunks run on a process pool if process_count isn't 1,
+    workers map the graph saved to a temporary file and read components from an array shared with them.
+
+    :param process_count: pool size, None for number of CPUs
+    :param chunk_count: number of vertex chunks per phase, 4 per process by default
+    :return (weight, edges) as prim does
+    """
+    assert isinstance(graph, Graph)
+    graph = graph.freeze()  # every edge of an undirected graph is a single arc
+
+    offsets, targets, _, _, _ = graph.get_csr_arrays()
+    marks = graph.get_mark_collection().values
+    arrays = (offsets, targets, marks)
+
+    vertex_count = len(graph)
+    if chunk_count is None:
+        chunk_count = 4 * (process_count or multiprocessing.cpu_count())
+    chunk_size = max(1, -(-vertex_count // chunk_count))
+    chunks = [(start, min(start + chunk_size, vertex_count)) for start in xrange(0, vertex_count, chunk_size)]
+
+    if process_count == 1:
+        return _join_components(offsets, targets, lambda components: [
+            _find_min_edges(arrays, components, start, stop) for start, stop in chunks])
+
+    # copied into once per phase, workers inherit the array instead of getting components with every task
+    shared_components = multiprocessing.RawArray(VERTEX_TYPECODE, vertex_count)
+
+    with parallel_dijkstra.worker_pool(process_count, _init_worker, (shared_components,), graph) as pool:
+        def find_chunk_min_edges(components):
+            shared_components[:] = components
+            return pool.map(_find_worker_min_edges, chunks)
+
+        return _join_components(offsets, targets, find_chunk_min_edges)
+
+
+class TestCase(unittest.TestCase):
+    def test_random(self):
+        rnd = random.Random(71)
+        graph = UndirectedGraph(80)
+        for _ in xrange(300):
+            graph.add(rnd.randrange(80), rnd.randrange(80), rnd.randint(1, 20))  # ties, maybe disconnected
+
+        expected_weight, expected_edges = kruskal(graph)
+
+        for process_count in (1, 2):
+            min_tree_weight, tree_edges = boruvka(graph, process_count)
+
+            self.assertEqual(expected_weight, min_tree_weight)
+            self.assertEqual(len(expected_edges), len(tree_edges))
+            self.assertEqual(min_tree_weight, sum(graph.get_mark(v_from, v_to) for v_from, v_to in tree_edges))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,316 @@
+
+import time
+import array
+import heapq
+import bisect
+import random
+import unittest
+
+from graph import Graph, UndirectedGraph, VERTEX_TYPECODE
+from dijkstra import dijkstra, shortest_path
+
+NO_MIDDLE_VERTEX = -1  # arc is an original one, not a shortcut
+
+
+def _witness_search(out_arcs, source, excluded_vertex, max_distance, settled_limit):
+    """limited Dijkstra from source avoiding excluded vertex
+
+    :return dict vertex -> length of some path found to it (not always the shortest one)
+    """
+    marks = {source: 0}
+    queue = [(0, source)]
+    settled_count = 0
+
+    while queue and settled_count < settled_limit:
+        v_mark, v_from = heapq.heappop(queue)
+        if v_mark > max_distance:
+            break
+        if v_mark > marks[v_from]:
+            continue  # stale queue entry
+
+        settled_count += 1
+        for v_to, weight in out_arcs[v_from].iteritems():
+            new_mark = v_mark + weight
+            if v_to != excluded_vertex and (v_to not in marks or marks[v_to] > new_mark):
+                marks[v_to] = new_mark
+                heapq.heappush(queue, (new_mark, v_to))
+
+    return marks
+
+
+def _find_shortcuts(out_arcs, in_arcs, vertex, settled_limit):
+    """:return list of (vertex_from, vertex_to, weight) shortcuts needed if the vertex is contracted"""
+    shortcuts = []
+
+    for v_from, in_weight in in_arcs[vertex].iteritems():
+        candidates = [(v_to, in_weight + out_weight) for v_to, out_weight in out_arcs[vertex].iteritems()
+                      if v_to != v_from]
+        if not candidates:
+            continue
+
+        max_distance = max(weight for _, weight in candidates)
+        witness_marks = _witness_search(out_arcs, v_from, vertex, max_distance, settled_limit)
+
+        for v_to, weight in candidates:
+            witness_mark = witness_marks.get(v_to)
+            if witness_mark is None or witness_mark > weight:
+                shortcuts.append((v_from, v_to, weight))
+
+    return shortcuts
+
+
+def _make_csr(rows, middle_vertices, reverse):
+    """:return (offsets, targets, weights, middle vertices) of arcs given by dicts vertex -> weight for every row"""
+    offsets = array.array(VERTEX_TYPECODE, [0])
+    targets, middles = array.array(VERTEX_TYPECODE), array.array(VERTEX_TYPECODE)
+    weights = []
+
+    for vertex_idx, row in enumerate(rows):
+        for v_to in sorted(row):
+            arc = (v_to, vertex_idx) if reverse else (vertex_idx, v_to)
+            targets.append(v_to)
+            weights.append(row[v_to])
+            middles.append(middle_vertices.get(arc, NO_MIDDLE_VERTEX))
+        offsets.append(len(targets))
+
+    return offsets, targets, weights, middles
+
+
+class ContractionHierarchy(object):
+    """contraction hierarchies index for repeated shortest path queries on a static graph with non-negative marks
+
+    Vertices are contracted one by one (ordered by edge difference + contracted neighbours), a shortcut replaces
+    every path u -> v -> w through a contracted vertex v without a witness path. Query is a bidirectional
+    Dijkstra going only to vertices of higher rank: forward over upward arcs, backward over downward ones.
+    Both arc sets are kept as CSR arrays, shortcuts remember their middle vertex to unpack paths.
+    """
+    def __init__(self, ranks, upward_arcs, downward_arcs):
+        self._ranks = ranks
+        self._upward_arcs = upward_arcs  # (offsets, targets, weights, middles), arcs to vertices of higher rank
+        self._downward_arcs = downward_arcs  # the same for arcs from vertices of higher rank, stored reversed
+
+    @classmethod
+    def build(cls, graph, witness_settled_limit=50):
+        assert isinstance(graph, Graph)
+        vertex_count = len(graph)
+
+        out_arcs = [{} for _ in xrange(vertex_count)]
+        in_arcs = [{} for _ in xrange(vertex_count)]
+
+        for v_from in xrange(vertex_count):
+            for v_to, weight in graph.iter_arc_marks(v_from):
+                assert weight >= 0, "Contraction hierarchies require non-negative marks"
+                out_arcs[v_from][v_to] = weight
+                in_arcs[v_to][v_from] = weight
+
+        middle_vertices = {}  # shortcut (vertex_from, vertex_to) -> contracted vertex
+        deleted_neighbours = [0] * vertex_count
+        ranks = array.array(VERTEX_TYPECODE, [0]) * vertex_count
+
+        def _get_priority(vertex):
+            shortcut_count = len(_find_shortcuts(out_arcs, in_arcs, vertex, witness_settled_limit))
+            edge_difference = shortcut_count - len(in_arcs[vertex]) - len(out_arcs[vertex])
+            return edge_difference + deleted_neighbours[vertex]
+
+        queue = [(_get_priority(vertex), vertex) for vertex in xrange(vertex_count)]
+        heapq.heapify(queue)
+        rank = 0
+
+        while queue:
+            _, vertex = heapq.heappop(queue)
+
+            # lazy update: priorities of the rest could only be changed by contraction of their neighbours
+            priority = _get_priority(vertex)
+            if queue and priority > queue[0][0]:
+                heapq.heappush(queue, (priority, vertex))
+                continue
+
+            for v_from, v_to, weight in _find_shortcuts(out_arcs, in_arcs, vertex, witness_settled_limit):
+                if v_to not in out_arcs[v_from] or out_arcs[v_from][v_to] > weight:
+                    out_arcs[v_from][v_to] = weight
+                    in_arcs[v_to][v_from] = weight
+                    middle_vertices[(v_from, v_to)] = vertex
+
+            # vertex keeps its arcs - they all go to vertices of higher rank now
+            for v_from in in_arcs[vertex]:
+                del out_arcs[v_from][vertex]
+                deleted_neighbours[v_from] += 1
+            for v_to in out_arcs[vertex]:
+                del in_arcs[v_to][vertex]
+                deleted_neighbours[v_to] += 1
+
+            ranks[vertex] = rank
+            rank += 1
+
+        return cls(ranks, _make_csr(out_arcs, middle_vertices, False), _make_csr(in_arcs, middle_vertices, True))
+
+    @property
+    def shortcut_count(self):
+        return sum(1 for arcs in (self._upward_arcs, self._downward_arcs)
+                   for middle in arcs[3] if middle != NO_MIDDLE_VERTEX)
+
+    @property
+    def index_size(self):
+        """:return approximate index size in bytes"""
+        size = self._ranks.itemsize * len(self._ranks)
+        for offsets, targets, weights, middles in (self._upward_arcs, self._downward_arcs):
+            size += offsets.itemsize * (len(offsets) + len(targets) + len(weights) + len(middles))
+        return size
+
+    def _search_step(self, arcs, queue, marks, prev_vertex_marks):
+        offsets, targets, weights, _ = arcs
+
+        v_mark, v_from = heapq.heappop(queue)
+        if v_mark > marks[v_from]:
+            return  # stale queue entry
+
+        for arc_id in xrange(offsets[v_from], offsets[v_from + 1]):
+            v_to, new_mark = targets[arc_id], v_mark + weights[arc_id]
+            if v_to not in marks or marks[v_to] > new_mark:
+                marks[v_to] = new_mark
+                prev_vertex_marks[v_to] = v_from
+                heapq.heappush(queue, (new_mark, v_to))
+
+    def _get_middle_vertex(self, vertex_from, vertex_to):
+        if self._ranks[vertex_from] < self._ranks[vertex_to]:
+            offsets, targets, _, middles = self._upward_arcs
+            row_vertex, row_target = vertex_from, vertex_to
+        else:
+            offsets, targets, _, middles = self._downward_arcs
+            row_vertex, row_target = vertex_to, vertex_from
+
+        arc_id = bisect.bisect_left(targets, row_target, offsets[row_vertex], offsets[row_vertex + 1])
+        return middles[arc_id]
+
+    def _unpack_path(self, path):
+        """replace shortcuts on the path with the original arcs"""
+        unpacked_path = [path[0]]
+        arcs_to_unpack = [(v_from, v_to) for v_from, v_to in zip(path, path[1:])][::-1]
+
+        while arcs_to_unpack:
+            v_from, v_to = arcs_to_unpack.pop()
+            middle_vertex = self._get_middle_vertex(v_from, v_to)
+            if middle_vertex == NO_MIDDLE_VERTEX:
+                unpacked_path.append(v_to)
+            else:
+                arcs_to_unpack.append((middle_vertex, v_to))
+                arcs_to_unpack.append((v_from, middle_vertex))
+
+        return unpacked_path
+
+    def query(self, source, target):
+        """:return (distance, path from source to target), (None, []) if target isn't reachable"""
+        assert 0 <= source < len(self._ranks)
+        assert 0 <= target < len(self._ranks)
+
+        marks = ({source: 0}, {target: 0})
+        prev_vertex_marks = ({source: None}, {target: None})
+        queues = ([(0, source)], [(0, target)])
+        arcs = (self._upward_arcs, self._downward_arcs)
+
+        best_mark, middle_vertex = None, None
+
+        while True:
+            # a side is done once its queue minimum can't improve the best path
+            active_sides = [side for side in (0, 1)
+                            if queues[side] and (best_mark is None or queues[side][0][0] < best_mark)]
+            if not active_sides:
+                break
+
+            side = min(active_sides, key=lambda side_idx: queues[side_idx][0][0])
+            vertex = queues[side][0][1]
+            self._search_step(arcs[side], queues[side], marks[side], prev_vertex_marks[side])
+
+            # settled vertex met by the other search
+            if vertex in marks[1 - side]:
+                mark = marks[0][vertex] + marks[1][vertex]
+                if best_mark is None or best_mark > mark:
+                    best_mark, middle_vertex = mark, vertex
+
+        if best_mark is None:
+            return None, []
+
+        path = [middle_vertex]
+        while prev_vertex_marks[0][path[-1]] is not None:
+            path.append(prev_vertex_marks[0][path[-1]])
+        path.reverse()
+        while prev_vertex_marks[1][path[-1]] is not None:
+            path.append(prev_vertex_marks[1][path[-1]])
+
+        return best_mark, self._unpack_path(path)
+
+
+def benchmark(graph, query_count=100, seed=0):
+    """compare contraction hierarchies with a point-to-point Dijkstra on random queries
+
+    :return dict with preprocessing time, index size and mean query latencies (seconds)
+    """
+    rnd = random.Random(seed)
+    queries = [(rnd.randrange(len(graph)), rnd.randrange(len(graph))) for _ in xrange(query_count)]
+
+    start_time = time.time()
+    hierarchy = ContractionHierarchy.build(graph)
+    preprocessing_time = time.time() - start_time
+
+    start_time = time.time()
+    for source, target in queries:
+        hierarchy.query(source, target)
+    query_time = (time.time() - start_time) / query_count
+
+    start_time = time.time()
+    for source, target in queries:
+        shortest_path(graph, source, target)
+    dijkstra_query_time = (time.time() - start_time) / query_count
+
+    return {
+        'preprocessing_time': preprocessing_time,
+        'index_size': hierarchy.index_size,
+        'shortcut_count': hierarchy.shortcut_count,
+        'query_time': query_time,
+        'dijkstra_query_time': dijkstra_query_time,
+    }
+
+
+class TestCase(unittest.TestCase):
+    def _check_queries(self, graph, hierarchy):
+        for source in xrange(0, len(graph), 5):
+            marks, _ = dijkstra(graph, source)
+            for target in xrange(len(graph)):
+                distance, path = hierarchy.query(source, target)
+
+                self.assertEqual(marks[target], distance)
+                if distance is not None:
+                    self.assertEqual((source, target), (path[0], path[-1]))
+                    self.assertEqual(distance, sum(graph.get_mark(v_from, v_to)
+                                                   for v_from, v_to in zip(path, path[1:])))
+
+    def test_directed(self):
+        rnd = random.Random(3)
+        graph = Graph(80)
+        for _ in xrange(320):
+            graph.add(rnd.randrange(80), rnd.randrange(80), rnd.randint(0, 20))
+
+        self._check_queries(graph, ContractionHierarchy.build(graph))
+
+    def test_undirected(self):
+        rnd = random.Random(4)
+        graph = UndirectedGraph(60)
+        for _ in xrange(150):
+            graph.add(rnd.randrange(60), rnd.randrange(60), rnd.randint(1, 20))
+
+        self._check_queries(graph, ContractionHierarchy.build(graph, witness_settled_limit=3))
+
+    def test_benchmark(self):
+        graph = Graph(30)
+        for v_from in xrange(29):
+            graph.add(v_from, v_from + 1, 1)
+            graph.add(v_from + 1, v_from, 2)
+
+        report = benchmark(graph, query_count=5)
+
+        self.assertGreater(report['index_size'], 0)
+        self.assertGreaterEqual(report['preprocessing_time'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,49 +1,152 @@
 
+import heapq
+import random
 import unittest
-from itertools import izip
-from graph import Graph
-
-
-def dijkstra(graph, source):
+from graph import Graph, UndirectedGraph
+from heaps import BinaryHeap, IndexedDaryHeap, select_queue_type
+
+
+def dijkstra(graph, source, queue_type=None, reverse=False, max_weight=None):
+    """
+    :param queue_type: vertex priority queue class - BinaryHeap, IndexedDaryHeap or any with the same interface,
+        chosen by max_weight if not given
+    :param reverse: search over reversed arcs, marks are distances to the source then
+    :param max_weight: marks are known to be integers in [0, max_weight], bucket queues are used then
+        (0-1 BFS for unit weights, Dial's buckets for small weights, radix heap otherwise)
+    """
     assert isinstance(graph, Graph)
     assert 0 <= source < len(graph)
 
+    if queue_type is None:
+        queue_type = select_queue_type(max_weight)
+
     marks = [None] * len(graph)
     prev_vertex_marks = [None] * len(graph)
     discovered = [False] * len(graph)
 
     marks[source] = 0
 
-    v_from = source
+    queue = queue_type(len(graph))
+    queue.push(source, 0)
+    arc_marks = get_arc_marks_iterator(graph, reverse)
 
-    while v_from >= 0:
+    while queue:
+        v_from, _ = queue.pop()
         discovered[v_from] = True
-        for v_to in graph[v_from]:
-            _relax(marks, prev_vertex_marks, v_from, v_to, graph.get_mark(v_from, v_to))
-        v_from = _find_min_undiscovered(marks, discovered)
+        for v_to, weight in arc_marks(v_from):
+            if _relax(marks, prev_vertex_marks, v_from, v_to, weight) and not discovered[v_to]:
+                queue.push(v_to, marks[v_to])
 
     # assert all(discovered), "Graph has stand-alone vertices"
     return marks, prev_vertex_marks
 
 
-def _find_min_undiscovered(marks, discovered):
-    assert len(marks) == len(discovered)
-    min_idx, min_mark = -1, None
+def get_arc_marks_iterator(graph, reverse=False):
+    """:return function iterating (vertex, mark) over arcs going from a vertex (coming to it if reverse)"""
+    if reverse and not isinstance(graph, UndirectedGraph):
+        return graph.iter_backward_marks
+    return graph.iter_arc_marks
+
+
+def shortest_path(graph, source, target):
+    """Dijkstra search stopping once the target is reached, only explored vertices are stored
+
+    :return (distance, path from source to target), (None, []) if target isn't reachable
+    """
+    assert isinstance(graph, Graph)
+    assert 0 <= source < len(graph)
+    assert 0 <= target < len(graph)
+
+    marks, prev_vertex_marks = {source: 0}, {source: None}
+    discovered = set()
+    queue = [(0, source)]
+
+    while queue:
+        v_mark, v_from = heapq.heappop(queue)
+        if v_from in discovered:
+            continue  # stale queue entry
+
+        if v_from == target:
+            return v_mark, _build_path(prev_vertex_marks, target)[::-1]
+
+        discovered.add(v_from)
+        for v_to, weight in graph.iter_arc_marks(v_from):
+            new_mark = v_mark + weight
+            if v_to not in discovered and (v_to not in marks or marks[v_to] > new_mark):
+                marks[v_to] = new_mark
+                prev_vertex_marks[v_to] = v_from
+                heapq.heappush(queue, (new_mark, v_to))
+
+    return None, []
+
+
+def bidirectional_shortest_path(graph, source, target):
+    """Dijkstra searches from source over forward arcs and from target over backward arcs at once
+
+    Search stops when the sum of both queue minimums reaches the best path found through a vertex seen by both.
+
+    :return (distance, path from source to target), (None, []) if target isn't reachable
+    """
+    assert isinstance(graph, Graph)
+    assert 0 <= source < len(graph)
+    assert 0 <= target < len(graph)
+
+    arc_marks = (get_arc_marks_iterator(graph), get_arc_marks_iterator(graph, reverse=True))
+
+    marks = ({source: 0}, {target: 0})
+    prev_vertex_marks = ({source: None}, {target: None})
+    discovered = (set(), set())
+    queues = ([(0, source)], [(0, target)])
+
+    best_mark, middle_vertex = (0, source) if source == target else (None, None)
+
+    while queues[0] and queues[1]:
+        if best_mark is not None and queues[0][0][0] + queues[1][0][0] >= best_mark:
+            break
 
-    for idx, (mark, discovered) in enumerate(izip(marks, discovered)):
-        if not discovered and mark is not None:
-            if min_mark is None or min_mark > mark:
-                min_idx = idx
-                min_mark = mark
+        side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+        other_marks = marks[1 - side]
+        side_marks, side_prev_vertex_marks, side_discovered, side_queue = \
+            marks[side], prev_vertex_marks[side], discovered[side], queues[side]
 
-    return min_idx
+        v_mark, v_from = heapq.heappop(side_queue)
+        if v_from in side_discovered:
+            continue  # stale queue entry
+
+        side_discovered.add(v_from)
+        for v_to, weight in arc_marks[side](v_from):
+            new_mark = v_mark + weight
+            if v_to not in side_discovered and (v_to not in side_marks or side_marks[v_to] > new_mark):
+                side_marks[v_to] = new_mark
+                side_prev_vertex_marks[v_to] = v_from
+                heapq.heappush(side_queue, (new_mark, v_to))
+
+                if v_to in other_marks and (best_mark is None or best_mark > new_mark + other_marks[v_to]):
+                    best_mark, middle_vertex = new_mark + other_marks[v_to], v_to
+
+    if best_mark is None:
+        return None, []
+
+    path = _build_path(prev_vertex_marks[0], middle_vertex)[::-1] + _build_path(prev_vertex_marks[1], middle_vertex)[1:]
+    return best_mark, path
+
+
+def _build_path(prev_vertex_marks, vertex):
+    """:return path from the vertex back to the search root"""
+    path = [vertex]
+    while prev_vertex_marks[path[-1]] is not None:
+        path.append(prev_vertex_marks[path[-1]])
+    return path
 
 
 def _relax(marks, prev_vertex_marks, v_from, v_to, weight):
+    """:return whether the mark of v_to is decreased"""
     new_mark = marks[v_from] + weight
     if marks[v_to] is None or marks[v_to] > new_mark:
         marks[v_to] = new_mark
         prev_vertex_marks[v_to] = v_from
+        return True
+    return False
 
 
 class TestCase(unittest.TestCase):
@@ -65,6 +168,67 @@ class TestCase(unittest.TestCase):
 
         self.assertListEqual(marks, expected_marks)
 
+        frozen_marks, _ = dijkstra(graph.freeze(), 0)
+
+        self.assertListEqual(frozen_marks, expected_marks)
+
+    def test_queue_types(self):
+        from bellman_ford import bellman_ford
+
+        rnd = random.Random(17)
+        graph = Graph(200)
+        for _ in xrange(1000):
+            graph.add(rnd.randrange(200), rnd.randrange(200), rnd.randint(0, 50))
+
+        expected_marks, _, _ = bellman_ford(graph, 0)
+
+        for queue_type in (BinaryHeap, IndexedDaryHeap):
+            marks, prev_vertex_marks = dijkstra(graph, 0, queue_type)
+
+            self.assertListEqual(expected_marks, marks)
+            for v_to, v_from in enumerate(prev_vertex_marks):
+                if v_from is not None:
+                    self.assertEqual(marks[v_to], marks[v_from] + graph.get_mark(v_from, v_to))
+
+        for max_weight in (50, 1 << 20):
+            marks, _ = dijkstra(graph, 0, max_weight=max_weight)
+
+            self.assertListEqual(expected_marks, marks)
+
+        for v_from in xrange(len(graph)):
+            for v_to in graph.get_forward(v_from):
+                graph.set_mark(v_from, v_to, (v_from + v_to) % 2)
+
+        expected_marks, _, _ = bellman_ford(graph, 0)
+        marks, _ = dijkstra(graph, 0, max_weight=1)
+
+        self.assertListEqual(expected_marks, marks)
+
+    def test_shortest_path(self):
+        rnd = random.Random(23)
+        graph, undirected_graph = Graph(100), UndirectedGraph(100)
+        for _ in xrange(300):
+            v_from, v_to, weight = rnd.randrange(100), rnd.randrange(100), rnd.randint(0, 30)
+            graph.add(v_from, v_to, weight)
+            undirected_graph.add(v_from, v_to, weight)
+
+        for checked_graph in (graph, undirected_graph, graph.freeze()):
+            for source in xrange(0, 100, 7):
+                marks, _ = dijkstra(checked_graph, source)
+
+                for target in xrange(0, 100, 3):
+                    for search in (shortest_path, bidirectional_shortest_path):
+                        distance, path = search(checked_graph, source, target)
+
+                        self.assertEqual(marks[target], distance)
+                        if distance is None:
+                            self.assertListEqual([], path)
+                            continue
+
+                        self.assertEqual((source, target), (path[0], path[-1]))
+                        self.assertEqual(distance, sum(checked_graph.get_mark(v_from, v_to)
+                                                       for v_from, v_to in zip(path, path[1:])))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,70 @@
+
+import unittest
+
+
+class DisjointSet(object):
+    """union-find over items 0..size-1 with path compression and union by rank"""
+    def __init__(self, size):
+        self._parents = range(size)
+        self._ranks = [0] * size
+        self._set_count = size
+
+    def __len__(self):
+        return len(self._parents)
+
+    @property
+    def set_count(self):
+        return self._set_count
+
+    def find(self, item):
+        """:return representative item of the set"""
+        parents = self._parents
+
+        root = item
+        while parents[root] != root:
+            root = parents[root]
+
+        while parents[item] != root:  # path compression
+            parents[item], item = root, parents[item]
+
+        return root
+
+    def union(self, item_a, item_b):
+        """merge sets of the items
+
+        :return False if they are in the same set already
+        """
+        root_a, root_b = self.find(item_a), self.find(item_b)
+        if root_a == root_b:
+            return False
+
+        ranks = self._ranks
+        if ranks[root_a] < ranks[root_b]:
+            root_a, root_b = root_b, root_a
+        self._parents[root_b] = root_a
+        if ranks[root_a] == ranks[root_b]:
+            ranks[root_a] += 1
+
+        self._set_count -= 1
+        return True
+
+    def is_connected(self, item_a, item_b):
+        return self.find(item_a) == self.find(item_b)
+
+
+class TestCase(unittest.TestCase):
+    def test_simple(self):
+        sets = DisjointSet(6)
+
+        self.assertTrue(sets.union(0, 1))
+        self.assertTrue(sets.union(2, 3))
+        self.assertTrue(sets.union(1, 3))
+        self.assertFalse(sets.union(0, 2))
+
+        self.assertTrue(sets.is_connected(0, 3))
+        self.assertFalse(sets.is_connected(0, 4))
+        self.assertEqual(3, sets.set_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
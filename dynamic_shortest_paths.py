@@ -0,0 +1,197 @@
+
+import heapq
+import random
+import unittest
+
+from graph import Graph, UndirectedGraph
+from dijkstra import dijkstra, get_arc_marks_iterator
+
+
+class DynamicShortestPaths(object):
+    """single-source shortest paths kept up to date while arcs are changed (Ramalingam-Reps style)
+
+    Graph must be changed through this object only. A decreased or added arc propagates new distances
+    from its end like Dijkstra does; an increased or removed tree arc recomputes distances of its
+    subtree only, starting from the best arcs coming into the subtree from the rest of the tree.
+    Marks must be non-negative.
+    """
+    def __init__(self, graph, source):
+        assert isinstance(graph, Graph)
+        assert 0 <= source < len(graph)
+
+        self._graph = graph
+        self._source = source
+        self._marks, self._prev_vertex_marks = dijkstra(graph, source)
+
+        self._children = [set() for _ in xrange(len(graph))]  # shortest paths tree
+        for vertex, prev_vertex in enumerate(self._prev_vertex_marks):
+            if prev_vertex is not None:
+                self._children[prev_vertex].add(vertex)
+
+    @property
+    def graph(self):
+        return self._graph
+
+    @property
+    def source(self):
+        return self._source
+
+    @property
+    def marks(self):
+        return self._marks
+
+    @property
+    def prev_vertex_marks(self):
+        return self._prev_vertex_marks
+
+    def set_mark(self, vertex_from, vertex_to, value):
+        assert value >= 0
+        old_value = self._graph.get_mark(vertex_from, vertex_to)
+        self._graph.set_mark(vertex_from, vertex_to, value)
+
+        if value < old_value:
+            self._on_decrease(vertex_from, vertex_to)
+        elif value > old_value:
+            self._on_increase(vertex_from, vertex_to)
+
+    def add(self, vertex_from, vertex_to, value):
+        assert value >= 0
+        if self._graph.has(vertex_from, vertex_to):
+            self.set_mark(vertex_from, vertex_to, value)
+            return
+
+        self._graph.add(vertex_from, vertex_to, value)
+        self._on_decrease(vertex_from, vertex_to)
+
+    def remove(self, vertex_from, vertex_to):
+        self._graph.remove(vertex_from, vertex_to)
+        self._on_increase(vertex_from, vertex_to)
+
+    def _get_arcs(self, vertex_from, vertex_to):
+        if isinstance(self._graph, UndirectedGraph):
+            return (vertex_from, vertex_to), (vertex_to, vertex_from)
+        return (vertex_from, vertex_to),
+
+    def _set_prev_vertex(self, vertex, prev_vertex):
+        old_prev_vertex = self._prev_vertex_marks[vertex]
+        if old_prev_vertex is not None:
+            self._children[old_prev_vertex].discard(vertex)
+        if prev_vertex is not None:
+            self._children[prev_vertex].add(vertex)
+        self._prev_vertex_marks[vertex] = prev_vertex
+
+    def _on_decrease(self, vertex_from, vertex_to):
+        marks = self._marks
+        arc_marks = get_arc_marks_iterator(self._graph)
+        queue = []
+
+        for v_from, v_to in self._get_arcs(vertex_from, vertex_to):
+            if marks[v_from] is not None:
+                new_mark = marks[v_from] + self._graph.get_mark(v_from, v_to)
+                if marks[v_to] is None or marks[v_to] > new_mark:
+                    marks[v_to] = new_mark
+                    self._set_prev_vertex(v_to, v_from)
+                    heapq.heappush(queue, (new_mark, v_to))
+
+        # only distances of vertices reached from the improved ones can decrease
+        while queue:
+            v_mark, v_from = heapq.heappop(queue)
+            if v_mark > marks[v_from]:
+                continue  # stale queue entry
+
+            for v_to, weight in arc_marks(v_from):
+                new_mark = v_mark + weight
+                if marks[v_to] is None or marks[v_to] > new_mark:
+                    marks[v_to] = new_mark
+                    self._set_prev_vertex(v_to, v_from)
+                    heapq.heappush(queue, (new_mark, v_to))
+
+    def _on_increase(self, vertex_from, vertex_to):
+        for v_from, v_to in self._get_arcs(vertex_from, vertex_to):
+            if self._prev_vertex_marks[v_to] == v_from:
+                self._recompute_subtree(v_to)
+
+    def _recompute_subtree(self, root):
+        marks, prev_vertex_marks = self._marks, self._prev_vertex_marks
+        arc_marks = get_arc_marks_iterator(self._graph)
+        backward_arc_marks = get_arc_marks_iterator(self._graph, reverse=True)
+
+        # distances of the subtree vertices are the only ones that can grow
+        affected_vertices = [root]
+        for vertex in affected_vertices:
+            affected_vertices.extend(self._children[vertex])
+
+        affected = set(affected_vertices)
+        for vertex in affected_vertices:
+            marks[vertex] = None
+            self._set_prev_vertex(vertex, None)
+
+        queue = []
+        for v_to in affected_vertices:
+            for v_from, weight in backward_arc_marks(v_to):
+                if v_from not in affected and marks[v_from] is not None:
+                    new_mark = marks[v_from] + weight
+                    if marks[v_to] is None or marks[v_to] > new_mark:
+                        marks[v_to] = new_mark
+                        prev_vertex_marks[v_to] = v_from
+
+        for vertex in affected_vertices:
+            if marks[vertex] is not None:
+                self._children[prev_vertex_marks[vertex]].add(vertex)
+                queue.append((marks[vertex], vertex))
+        heapq.heapify(queue)
+
+        while queue:
+            v_mark, v_from = heapq.heappop(queue)
+            if v_mark > marks[v_from]:
+                continue  # stale queue entry
+
+            for v_to, weight in arc_marks(v_from):
+                new_mark = v_mark + weight
+                if v_to in affected and (marks[v_to] is None or marks[v_to] > new_mark):
+                    marks[v_to] = new_mark
+                    self._set_prev_vertex(v_to, v_from)
+                    heapq.heappush(queue, (new_mark, v_to))
+
+
+class TestCase(unittest.TestCase):
+    def _check(self, graph_type):
+        rnd = random.Random(31)
+        graph = graph_type(40)
+        for _ in xrange(120):
+            graph.add(rnd.randrange(40), rnd.randrange(40), rnd.randint(0, 20))
+
+        paths = DynamicShortestPaths(graph, 0)
+
+        for _ in xrange(300):
+            v_from, v_to = rnd.randrange(40), rnd.randrange(40)
+            if v_from == v_to:
+                continue
+
+            if graph.has(v_from, v_to):
+                if rnd.random() < 0.3:
+                    paths.remove(v_from, v_to)
+                else:
+                    paths.set_mark(v_from, v_to, rnd.randint(0, 20))
+            else:
+                paths.add(v_from, v_to, rnd.randint(0, 20))
+
+            expected_marks, _ = dijkstra(graph, 0)
+
+            self.assertListEqual(expected_marks, paths.marks)
+            for vertex, prev_vertex in enumerate(paths.prev_vertex_marks):
+                if prev_vertex is not None:
+                    self.assertEqual(paths.marks[vertex],
+                                     paths.marks[prev_vertex] + graph.get_mark(prev_vertex, vertex))
+                else:
+                    self.assertTrue(vertex == 0 or paths.marks[vertex] is None)
+
+    def test_directed(self):
+        self._check(Graph)
+
+    def test_undirected(self):
+        self._check(UndirectedGraph)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,16 @@
 
+import os
+import random
 import unittest
+import tempfile
 from graph import Graph
+import graph_helper
+import parallel_dijkstra
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 def floyd_warshall(graph):
@@ -9,9 +19,8 @@ def floyd_warshall(graph):
 
     # setup distances
     for v_from in xrange(len(graph)):
-        for v_to in xrange(len(graph)):
-            if graph.has(v_from, v_to):
-                marks[v_from][v_to] = graph.get_mark(v_from, v_to)
+        for v_to, weight in graph.iter_arc_marks(v_from):
+            marks[v_from][v_to] = weight
         marks[v_from][v_from] = 0  # d(i, i) = 0
 
     # don't save path currently - only distance
@@ -31,6 +40,153 @@ def floyd_warshall(graph):
     return marks
 
 
+def vectorized_floyd_warshall(graph, with_paths=False):
+    """Floyd-Warshall on a numpy distance matrix, one vectorized update per pivot vertex, needs numpy
+
+    Missing paths are inf. Search stops once a negative cycle shows up on the diagonal, distances aren't
+    final then and not every vertex on negative cycles is found.
+
+    :param with_paths: keep predecessors matrix for get_path(), predecessors[i, j] is the vertex before j
+        on the shortest path from i to j, -1 if there is no path
+    :return (distances, predecessors or None, vertices found on negative cycles - empty if there are none)
+    """
+    assert numpy is not None, "numpy is required"
+    assert isinstance(graph, Graph)
+
+    sources, targets, weights = graph_helper.get_arc_arrays(graph)
+
+    distances = numpy.full((len(graph), len(graph)), numpy.inf)
+    distances[sources, targets] = weights
+    numpy.fill_diagonal(distances, 0)  # d(i, i) = 0
+
+    predecessors = None
+    if with_paths:
+        predecessors = numpy.full((len(graph), len(graph)), -1, dtype=numpy.int64)
+        predecessors[sources, targets] = sources
+
+    for last_vertex_idx in xrange(len(graph)):
+        new_distances = distances[:, last_vertex_idx, None] + distances[None, last_vertex_idx, :]
+
+        if predecessors is not None:
+            is_shorter = new_distances < distances
+            predecessors = numpy.where(is_shorter, predecessors[last_vertex_idx], predecessors)
+
+        numpy.minimum(distances, new_distances, out=distances)
+
+        if distances.diagonal().min() < 0:
+            break
+
+    return distances, predecessors, numpy.flatnonzero(distances.diagonal() < 0).tolist()
+
+
+def get_path(predecessors, v_from, v_to):
+    """:return path from v_from to v_to by predecessors matrix of vectorized_floyd_warshall, [] if no path"""
+    if v_from == v_to:
+        return [v_from]
+    if predecessors[v_from, v_to] < 0:
+        return []
+
+    path = [v_to]
+    while path[-1] != v_from:
+        path.append(int(predecessors[v_from, path[-1]]))
+
+    return path[::-1]
+
+
+_worker_distances = None  # distance matrix mapped by a pool worker
+_worker_blocks = None  # its slices of blocks
+
+
+def _get_blocks(vertex_count, block_size):
+    return [slice(start, min(start + block_size, vertex_count)) for start in xrange(0, vertex_count, block_size)]
+
+
+def _init_worker(path, vertex_count, block_size):
+    global _worker_distances, _worker_blocks
+    _worker_distances = numpy.memmap(path, dtype=numpy.float64, mode='r+', shape=(vertex_count, vertex_count))
+    _worker_blocks = _get_blocks(vertex_count, block_size)
+
+
+def _relax_tile(distances, rows, columns, pivots):
+    """update tile distances[rows, columns] by min-plus product of distances[rows, pivots] and
+    distances[pivots, columns], all the pivots are applied to the tile copy before it is written back
+
+    The tile is its own left (right) factor in the pivot column (row) of blocks, so updates through
+    earlier pivots are seen by the later ones like in plain Floyd-Warshall.
+    """
+    tile = numpy.array(distances[rows, columns])
+    left = tile if columns == pivots else numpy.array(distances[rows, pivots])
+    right = tile if rows == pivots else numpy.array(distances[pivots, columns])
+    new_distances = numpy.empty_like(tile)
+
+    for pivot in xrange(pivots.stop - pivots.start):
+        numpy.add(left[:, pivot, None], right[pivot], out=new_distances)
+        numpy.minimum(tile, new_distances, out=tile)
+
+    distances[rows, columns] = tile
+
+
+def _relax_worker_tile(task):
+    row_block, column_block, pivot_block = task
+    _relax_tile(_worker_distances, _worker_blocks[row_block], _worker_blocks[column_block], _worker_blocks[pivot_block])
+
+
+def _relax_blocks(distances, blocks, pool):
+    for pivot_block, pivots in enumerate(blocks):
+        # phase 1: diagonal block
+        _relax_tile(distances, pivots, pivots, pivots)
+
+        # shared mappings see each other's writes, no flush is needed between the phases
+        other_blocks = [block_idx for block_idx in xrange(len(blocks)) if block_idx != pivot_block]
+
+        # phase 2: row and column of blocks through the closed diagonal block
+        pool.map(_relax_worker_tile, [task for block_idx in other_blocks
+                                      for task in ((pivot_block, block_idx, pivot_block),
+                                                   (block_idx, pivot_block, pivot_block))])
+
+        # phase 3: other tiles, their pivot row and column tiles are final already
+        pool.map(_relax_worker_tile, [(row_block, column_block, pivot_block)
+                                      for row_block in other_blocks for column_block in other_blocks])
+
+
+def blocked_floyd_warshall(graph, path, block_size=256, process_count=None):
+    """tiled Floyd-Warshall over a distance matrix memory-mapped from a file, needs numpy
+
+    For every diagonal block: phase 1 closes the block itself, phase 2 updates the other tiles of its row
+    and column of blocks through it, phase 3 updates every other tile by min-plus product of its pivot
+    column and row tiles. Phases 2 and 3 run by tiles on a process pool. Every process maps the same file,
+    so the matrix is never pickled and doesn't have to fit into memory, while a tile and its two factors
+    (3 x block_size^2 floats) stay in cache for all block_size pivots.
+    Missing paths are inf, negative values on the diagonal mark vertices on negative cycles.
+
+    :param path: file to store the distance matrix in (float64, |V| x |V|)
+    :param process_count: pool size, number of CPUs by default
+    :return numpy.memmap with distances
+    """
+    assert numpy is not None, "numpy is required"
+    assert isinstance(graph, Graph)
+    assert block_size > 0
+
+    vertex_count = len(graph)
+    sources, targets, weights = graph_helper.get_arc_arrays(graph)
+
+    distances = numpy.memmap(path, dtype=numpy.float64, mode='w+', shape=(vertex_count, vertex_count))
+    distances.fill(numpy.inf)
+    distances[sources, targets] = weights
+    numpy.fill_diagonal(distances, 0)  # d(i, i) = 0
+    distances.flush()
+
+    blocks = _get_blocks(vertex_count, block_size)
+    if len(blocks) == 1:
+        _relax_tile(distances, blocks[0], blocks[0], blocks[0])
+    else:
+        with parallel_dijkstra.worker_pool(process_count, _init_worker, (path, vertex_count, block_size)) as pool:
+            _relax_blocks(distances, blocks, pool)
+
+    distances.flush()
+    return distances
+
+
 class TestCase(unittest.TestCase):
     def test_simple(self):
         graph = Graph(6)
@@ -57,6 +213,66 @@ class TestCase(unittest.TestCase):
         for v_from in xrange(len(graph)):
             self.assertListEqual(marks[v_from], expected_marks[v_from])
 
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_vectorized(self):
+        rnd = random.Random(47)
+        graph = Graph(40)
+        for _ in xrange(200):
+            v_from, v_to = rnd.randrange(40), rnd.randrange(40)
+            graph.add(v_from, v_to, rnd.randint(0, 20) + v_to - v_from)  # no negative cycles
+
+        expected_marks = floyd_warshall(graph)
+        distances, predecessors, negative_cycle_vertices = vectorized_floyd_warshall(graph, with_paths=True)
+
+        self.assertListEqual([], negative_cycle_vertices)
+        for v_from in xrange(len(graph)):
+            self.assertListEqual(expected_marks[v_from],
+                                 [int(mark) if mark != numpy.inf else None for mark in distances[v_from]])
+
+            for v_to in xrange(len(graph)):
+                path = get_path(predecessors, v_from, v_to)
+                if expected_marks[v_from][v_to] is None:
+                    self.assertListEqual([], path)
+                else:
+                    self.assertEqual((v_from, v_to), (path[0], path[-1]))
+                    self.assertEqual(expected_marks[v_from][v_to],
+                                     sum(graph.get_mark(v, v_next) for v, v_next in zip(path, path[1:])))
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_vectorized_neg_cycle(self):
+        graph = Graph(4)
+
+        graph.add(0, 1, 10)
+        graph.add(1, 2, -5)
+        graph.add(2, 1, -6)
+        graph.add(2, 3, 1)
+
+        _, predecessors, negative_cycle_vertices = vectorized_floyd_warshall(graph)
+
+        self.assertIsNone(predecessors)
+        self.assertTrue(negative_cycle_vertices)
+        self.assertLessEqual(set(negative_cycle_vertices), {1, 2})
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_blocked(self):
+        rnd = random.Random(53)
+        graph = Graph(50)
+        for _ in xrange(300):
+            v_from, v_to = rnd.randrange(50), rnd.randrange(50)
+            graph.add(v_from, v_to, rnd.randint(0, 20) + v_to - v_from)  # no negative cycles
+
+        expected_distances, _, _ = vectorized_floyd_warshall(graph)
+
+        handle, path = tempfile.mkstemp(suffix='.distances')
+        os.close(handle)
+        try:
+            distances = blocked_floyd_warshall(graph, path, block_size=16, process_count=2)
+
+            self.assertTrue(numpy.array_equal(expected_distances, distances))
+            del distances
+        finally:
+            os.remove(path)
+
 
 if __name__ == '__main__':
     unittest.main()
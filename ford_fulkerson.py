@@ -3,11 +3,11 @@ import unittest
 from collections import namedtuple
 
 import graph_helper
-from graph import Graph
+from graph import Graph, UndirectedGraph
 
 
 SENTINEL_VERTEX = -1
-VertexMark = namedtuple('VertexMark', ['prev', 'is_forward', 'estimate'])
+VertexMark = namedtuple('VertexMark', ['prev', 'is_forward', 'estimate', 'arc_id'])
 
 
 def _dfs(graph, source, target, marks, edge_marks, discovered):
@@ -18,10 +18,10 @@ def _dfs(graph, source, target, marks, edge_marks, discovered):
 
     # forward arcs
     v_from = source
-    for v_to in graph.get_forward(v_from):
+    for v_to, arc_id in graph.iter_forward_arcs(v_from):
         if extra_flow is None and not discovered[v_to] and marks[v_to].prev is None:
-            edge_flow = edge_marks[(v_from, v_to)]
-            max_edge_flow = graph.get_mark(v_from, v_to)
+            edge_flow = edge_marks.get_arc_mark(arc_id)
+            max_edge_flow = graph.get_arc_mark(arc_id)
 
             if edge_flow == max_edge_flow:
                 continue
@@ -31,14 +31,14 @@ def _dfs(graph, source, target, marks, edge_marks, discovered):
             else:
                 estimate_to = min(marks[v_from].estimate, max_edge_flow - edge_flow)
 
-            marks[v_to] = VertexMark(v_from, True, estimate_to)
+            marks[v_to] = VertexMark(v_from, True, estimate_to, arc_id)
             extra_flow = _dfs(graph, v_to, target, marks, edge_marks, discovered)
 
     # backward arcs
     v_to = source
-    for v_from in graph.get_backward(v_to):  # use inverse graph just to know arcs
+    for v_from, arc_id in graph.iter_backward_arcs(v_to):  # use inverse graph just to know arcs
         if extra_flow is None and not discovered[v_from] and marks[v_from].prev is None:
-            edge_flow = edge_marks[(v_from, v_to)]
+            edge_flow = edge_marks.get_arc_mark(arc_id)
 
             if edge_flow == 0:
                 continue
@@ -48,7 +48,7 @@ def _dfs(graph, source, target, marks, edge_marks, discovered):
             else:
                 estimate_from = min(marks[v_to].estimate, edge_flow)
 
-            marks[v_from] = VertexMark(v_to, False, estimate_from)
+            marks[v_from] = VertexMark(v_to, False, estimate_from, arc_id)
             extra_flow = _dfs(graph, v_from, target, marks, edge_marks, discovered)
 
     discovered[source] = True
@@ -61,19 +61,20 @@ def _update_edge_marks(extra_flow, source, target, marks, edge_marks):
 
     while v_prev != source:
         v_curr, v_prev = v_prev, marks[v_prev].prev
-        is_forward = marks[v_curr].is_forward
+        is_forward, arc_id = marks[v_curr].is_forward, marks[v_curr].arc_id
+        edge_flow = edge_marks.get_arc_mark(arc_id)
 
         if is_forward:
-            edge_marks[(v_prev, v_curr)] += extra_flow
+            edge_marks.set_arc_mark(arc_id, edge_flow + extra_flow)
         else:
-            edge_marks[(v_curr, v_prev)] -= extra_flow
+            edge_marks.set_arc_mark(arc_id, edge_flow - extra_flow)
 
 
 def _estimate_max_flow(graph, source, edge_marks):
     flow = 0
 
-    for v_to in graph[source]:
-        flow += edge_marks[(source, v_to)]
+    for _, arc_id in graph.iter_forward_arcs(source):
+        flow += edge_marks.get_arc_mark(arc_id)
 
     return flow
 
@@ -109,6 +110,8 @@ def ford_fulkerson(graph, source, target, initial_flow=None):
     assert 0 <= source < len(graph)
     assert 0 <= target < len(graph)
 
+    graph = graph.freeze()  # arcs get indices, flow is kept in an array by arc index
+
     if initial_flow is None:
         flow_marks = graph.get_mark_collection()
         flow_marks.reset_marks(0)  # set zero flow
@@ -120,8 +123,8 @@ def ford_fulkerson(graph, source, target, initial_flow=None):
     while extra_flow:
         discovered = [False] * len(graph)
 
-        marks = [VertexMark(None, None, None)] * len(graph)
-        marks[source] = VertexMark(SENTINEL_VERTEX, None, None)
+        marks = [VertexMark(None, None, None, None)] * len(graph)
+        marks[source] = VertexMark(SENTINEL_VERTEX, None, None, None)
 
         extra_flow = _dfs(graph, source, target, marks, flow_marks, discovered)
 
@@ -183,6 +186,29 @@ class TestCase(unittest.TestCase):
 
         self.assertEqual(value, expected_value)
 
+    def test_undirected(self):
+        graph = UndirectedGraph(3)
+
+        graph.add(1, 0, 5)
+        graph.add(2, 1, 4)
+
+        value, _, _ = ford_fulkerson(graph, 2, 0)  # edges are arcs in the direction they were added with
+        expected_value = 4
+
+        self.assertEqual(value, expected_value)
+
+    def test_undirected_multi(self):
+        graph = UndirectedGraph(4)
+
+        graph.add(1, 0, 5)
+        graph.add(2, 1, 4)
+        graph.add(2, 3, 3)
+
+        value = ford_fulkerson_multi(graph, [0], [3])
+        expected_value = 3
+
+        self.assertEqual(value, expected_value)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,29 +1,52 @@
 
 import copy
+import array
+import bisect
+import unittest
 import itertools
 import collections
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+VERTEX_TYPECODE = 'l'  # signed machine word, enough for vertex and arc indices
+
+_version_counter = itertools.count()  # graph versions are never repeated, even by different graphs
+
 
 class ArcMarks(collections.Mapping):
     def __init__(self):
         self._marks = {}
+        self._is_shared = False  # storage is shared with a copy
 
     def copy(self):
-        return copy.deepcopy(self)
+        """:return ArcMarks sharing storage with this one until any of them is changed"""
+        marks = copy.copy(self)
+        marks._is_shared = self._is_shared = True
+        return marks
+
+    def _own_marks(self):
+        if self._is_shared:
+            self._marks = dict(self._marks)
+            self._is_shared = False
 
     def get_mark(self, vertex_from, vertex_to):
         return self._marks.get((vertex_from, vertex_to), None)
 
     def set_mark(self, vertex_from, vertex_to, value):
+        self._own_marks()
         self._marks[(vertex_from, vertex_to)] = value
 
     def del_mark(self, vertex_from, vertex_to):
         if (vertex_from, vertex_to) in self._marks:
+            self._own_marks()
             del self._marks[(vertex_from, vertex_to)]
 
     def reset_marks(self, default_value=None):
-        for key in self._marks.iterkeys():
-            self._marks[key] = default_value
+        self._marks = dict.fromkeys(self._marks, default_value)
+        self._is_shared = False
 
     def __getitem__(self, key):
         vertex_from, vertex_to = key
@@ -49,6 +72,51 @@ class Graph(object):
         self._arcs = [set() for _ in xrange(vertex_count)]  # doesn't support multiple arcs
         self._reversed_arcs = [set() for _ in xrange(vertex_count)]
         self._marks = ArcMarks()
+        self._is_shared = False  # arcs are shared with a copy
+        self._version = next(_version_counter)
+
+    @classmethod
+    def from_edges(cls, sources, targets, marks=None, vertex_count=None):
+        """build graph from arc arrays in one pass
+
+        Any sequences work: lists, array.array, numpy arrays. Loops are dropped, multiple arcs are merged
+        keeping the last mark. Vertex count defaults to the max vertex index + 1.
+        """
+        if numpy is not None:
+            sources, targets, marks, vertex_count = _unique_arcs(sources, targets, marks, vertex_count, False)
+
+            graph = cls(vertex_count)
+            _fill_adjacent_sets(graph._arcs, sources, targets)
+            reversed_order = numpy.argsort(targets, kind='mergesort')
+            _fill_adjacent_sets(graph._reversed_arcs, targets[reversed_order], sources[reversed_order])
+            arc_marks = dict(itertools.izip(itertools.izip(sources.tolist(), targets.tolist()), _as_list(marks)))
+        else:
+            sources, targets, marks, vertex_count = _check_arcs(sources, targets, marks, vertex_count)
+
+            # sets don't need sorted arcs, the dict merges multiple arcs keeping the last mark
+            graph = cls(vertex_count)
+            arcs, reversed_arcs = graph._arcs, graph._reversed_arcs
+            arc_marks = dict(itertools.izip(itertools.izip(sources, targets), marks))
+
+            for v_from, v_to in arc_marks.keys():
+                if v_from != v_to:
+                    arcs[v_from].add(v_to)
+                    reversed_arcs[v_to].add(v_from)
+                else:  # doesn't support loops
+                    del arc_marks[(v_from, v_to)]
+
+        if None in arc_marks.itervalues():
+            arc_marks = dict(item for item in arc_marks.iteritems() if item[1] is not None)
+        graph._marks._marks = arc_marks
+        return graph
+
+    @property
+    def version(self):
+        """changes on every add, remove, set_mark and add_vertex, so results computed for a version stay valid"""
+        return self._version
+
+    def _bump_version(self):
+        self._version = next(_version_counter)
 
     @property
     def arc_count(self):
@@ -77,6 +145,22 @@ class Graph(object):
     def has(self, vertex_from, vertex_to):
         return vertex_to in self[vertex_from]
 
+    def iter_forward_marks(self, vertex_idx):
+        """iterate (vertex_to, mark) over arcs going from the vertex"""
+        get_mark = self._marks.get_mark
+        for v_to in self._arcs[vertex_idx]:
+            yield v_to, get_mark(vertex_idx, v_to)
+
+    def iter_backward_marks(self, vertex_idx):
+        """iterate (vertex_from, mark) over arcs coming to the vertex"""
+        get_mark = self._marks.get_mark
+        for v_from in self._reversed_arcs[vertex_idx]:
+            yield v_from, get_mark(v_from, vertex_idx)
+
+    def iter_arc_marks(self, vertex_idx):
+        """iterate (vertex_to, mark) over self[vertex_idx]"""
+        return self.iter_forward_marks(vertex_idx)
+
     def get_mark_collection(self):
         """:return ArcMarks"""
         return self._marks.copy()
@@ -86,46 +170,1052 @@ class Graph(object):
 
     def set_mark(self, vertex_from, vertex_to, value):
         self._marks.set_mark(vertex_from, vertex_to, value)
+        self._bump_version()
+
+    def _own_arcs(self):
+        if self._is_shared:
+            self._arcs = [set(adjacent_arcs) for adjacent_arcs in self._arcs]
+            self._reversed_arcs = [set(adjacent_arcs) for adjacent_arcs in self._reversed_arcs]
+            self._is_shared = False
 
     def add(self, vertex_from, vertex_to, value=None):
         if vertex_from != vertex_to:  # doesn't support loops
+            self._own_arcs()
             self._arcs[vertex_from].add(vertex_to)
             self._reversed_arcs[vertex_to].add(vertex_from)
             if value is not None:
                 self._marks.set_mark(vertex_from, vertex_to, value)
+            self._bump_version()
 
     def remove(self, vertex_from, vertex_to):
+        self._own_arcs()
         self._arcs[vertex_from].remove(vertex_to)
         self._reversed_arcs[vertex_to].remove(vertex_from)
         self._marks.del_mark(vertex_from, vertex_to)
+        self._bump_version()
+
+    def add_vertex(self):
+        """append stand-alone vertex
+
+        :return index of the new vertex
+        """
+        self._own_arcs()
+        self._arcs.append(set())
+        self._reversed_arcs.append(set())
+        self._bump_version()
+        return len(self._arcs) - 1
 
     def copy(self):
-        """:return Graph"""
-        return copy.deepcopy(self)
+        """:return Graph sharing arcs and marks with this one until any of them is changed"""
+        graph = copy.copy(self)
+        graph._marks = self._marks.copy()
+        graph._is_shared = self._is_shared = True
+        return graph
+
+    def clone(self):
+        """:return Graph with its own arcs right away, for a copy that is going to be changed anyway"""
+        graph = copy.copy(self)
+        graph._arcs = [set(adjacent_arcs) for adjacent_arcs in self._arcs]
+        graph._reversed_arcs = [set(adjacent_arcs) for adjacent_arcs in self._reversed_arcs]
+        graph._marks = self._marks.copy()
+        graph._is_shared = False
+        return graph
+
+    def freeze(self):
+        """:return FrozenGraph"""
+        return FrozenGraph.from_graph(self)
 
 
 class UndirectedGraph(Graph):
+    """graph storing every edge once by edge index
+
+    Both ends of an edge map each other to the edge index, so a mark lookup is one dict access and one
+    list access. Edge indices are dense: removing an edge moves the last edge to its index.
+    Direction an edge was added with is kept for get_forward() and get_backward().
+    """
+    def __init__(self, vertex_count):
+        self._adjacent = [{} for _ in xrange(vertex_count)]  # adjacent vertex -> edge index
+        self._edge_sources = array.array(VERTEX_TYPECODE)
+        self._edge_targets = array.array(VERTEX_TYPECODE)
+        self._edge_marks = []
+        self._is_shared = False  # edges are shared with a copy
+        self._are_marks_shared = False  # edge marks are shared with a copy
+        self._version = next(_version_counter)
+
+    @classmethod
+    def from_edges(cls, sources, targets, marks=None, vertex_count=None):
+        """build graph from edge arrays in one pass, edges go from the lower vertex index"""
+        if numpy is not None:
+            sources, targets, marks, vertex_count = _unique_arcs(sources, targets, marks, vertex_count, True)
+
+            graph = cls(vertex_count)
+            edge_ids = numpy.arange(len(sources))
+            _fill_adjacent_dicts(graph._adjacent, sources, targets, edge_ids)
+            reversed_order = numpy.argsort(targets, kind='mergesort')
+            _fill_adjacent_dicts(graph._adjacent, targets[reversed_order], sources[reversed_order],
+                                 edge_ids[reversed_order])
+            graph._edge_sources, graph._edge_targets = _as_typed_array(sources), _as_typed_array(targets)
+            graph._edge_marks = _as_list(marks)
+            return graph
+
+        sources, targets, marks, vertex_count = _check_arcs(sources, targets, marks, vertex_count)
+
+        # edges keep the order of their first arcs, no sorting is needed
+        graph = cls(vertex_count)
+        adjacent, edge_sources, edge_targets, edge_marks = (graph._adjacent, graph._edge_sources,
+                                                            graph._edge_targets, graph._edge_marks)
+
+        for v_from, v_to, mark in itertools.izip(sources, targets, marks):
+            if v_from == v_to:  # doesn't support loops
+                continue
+            if v_from > v_to:
+                v_from, v_to = v_to, v_from
+
+            edge_id = adjacent[v_from].get(v_to)
+            if edge_id is None:
+                edge_id = len(edge_marks)
+                adjacent[v_from][v_to] = adjacent[v_to][v_from] = edge_id
+                edge_sources.append(v_from)
+                edge_targets.append(v_to)
+                edge_marks.append(mark)
+            else:
+                edge_marks[edge_id] = mark
+
+        return graph
+
     @property
     def edge_count(self):
         return self.arc_count
 
+    @property
+    def arc_count(self):
+        return len(self._edge_sources)
+
     def __iter__(self):
-        for (adj_arcs, adj_backward_arcs) in itertools.izip(self._arcs, self._reversed_arcs):
-            yield itertools.chain(adj_arcs, adj_backward_arcs)
+        for vertex_idx in xrange(self.vertex_count):
+            yield self.get_adjacent(vertex_idx)
+
+    @property
+    def vertex_count(self):
+        return len(self._adjacent)
 
     def get_adjacent(self, vertex_idx):
-        return itertools.chain(self.get_forward(vertex_idx), self.get_backward(vertex_idx))
+        """:return mapping adjacent vertex -> edge index, iterating it gives adjacent vertices"""
+        return self._adjacent[vertex_idx]
 
     def __getitem__(self, vertex_idx):
         return self.get_adjacent(vertex_idx)
 
+    def get_forward(self, vertex_idx):
+        edge_sources = self._edge_sources
+        return set(v_to for v_to, edge_id in self._adjacent[vertex_idx].iteritems()
+                   if edge_sources[edge_id] == vertex_idx)
+
+    def get_backward(self, vertex_idx):
+        edge_targets = self._edge_targets
+        return set(v_from for v_from, edge_id in self._adjacent[vertex_idx].iteritems()
+                   if edge_targets[edge_id] == vertex_idx)
+
+    def get_arc_id(self, vertex_from, vertex_to):
+        """:return index of the edge or None if there is no such edge"""
+        return self._adjacent[vertex_from].get(vertex_to)
+
+    def iter_arcs(self):
+        """iterate (vertex_from, vertex_to) in edge index order"""
+        return itertools.izip(self._edge_sources, self._edge_targets)
+
+    def has(self, vertex_from, vertex_to):
+        return vertex_to in self._adjacent[vertex_from]
+
+    def iter_forward_marks(self, vertex_idx):
+        return ((v_to, self.get_mark(vertex_idx, v_to)) for v_to in self.get_forward(vertex_idx))
+
+    def iter_backward_marks(self, vertex_idx):
+        return ((v_from, self.get_mark(v_from, vertex_idx)) for v_from in self.get_backward(vertex_idx))
+
+    def iter_arc_marks(self, vertex_idx):
+        adjacent = self._adjacent[vertex_idx]
+        return itertools.izip(adjacent.iterkeys(), itertools.imap(self._edge_marks.__getitem__, adjacent.itervalues()))
+
+    def get_mark_collection(self):
+        """:return ArcMarks keyed by edges in the direction they were added with"""
+        marks = ArcMarks()
+        marks._marks = dict((arc, mark) for arc, mark in itertools.izip(self.iter_arcs(), self._edge_marks)
+                            if mark is not None)
+        return marks
+
+    def get_mark(self, vertex_from, vertex_to):
+        edge_id = self._adjacent[vertex_from].get(vertex_to)
+        return self._edge_marks[edge_id] if edge_id is not None else None
+
+    def set_mark(self, vertex_from, vertex_to, value):
+        edge_id = self._adjacent[vertex_from][vertex_to]
+        self._own_marks()
+        self._edge_marks[edge_id] = value
+        self._bump_version()
+
+    def _own_arcs(self):
+        if self._is_shared:
+            self._adjacent = [dict(adjacent) for adjacent in self._adjacent]
+            self._edge_sources = self._edge_sources[:]
+            self._edge_targets = self._edge_targets[:]
+            self._is_shared = False
+
+    def _own_marks(self):
+        if self._are_marks_shared:
+            self._edge_marks = list(self._edge_marks)
+            self._are_marks_shared = False
+
+    def add(self, vertex_from, vertex_to, value=None):
+        if vertex_from == vertex_to:  # doesn't support loops
+            return
+
+        edge_id = self._adjacent[vertex_from].get(vertex_to)
+        if edge_id is None:  # doesn't support multiple edges
+            self._own_arcs()
+            self._own_marks()
+            edge_id = len(self._edge_sources)
+            self._edge_sources.append(vertex_from)
+            self._edge_targets.append(vertex_to)
+            self._edge_marks.append(value)
+            self._adjacent[vertex_from][vertex_to] = edge_id
+            self._adjacent[vertex_to][vertex_from] = edge_id
+        elif value is not None:
+            self._own_marks()
+            self._edge_marks[edge_id] = value
+        else:
+            return
+
+        self._bump_version()
+
+    def remove(self, vertex_from, vertex_to):
+        self._own_arcs()
+        self._own_marks()
+
+        edge_id = self._adjacent[vertex_from].pop(vertex_to)
+        del self._adjacent[vertex_to][vertex_from]
+
+        # keep edge indices dense: move the last edge to the free index
+        last_edge_id = len(self._edge_sources) - 1
+        if edge_id != last_edge_id:
+            v_from, v_to = self._edge_sources[last_edge_id], self._edge_targets[last_edge_id]
+            self._edge_sources[edge_id], self._edge_targets[edge_id] = v_from, v_to
+            self._edge_marks[edge_id] = self._edge_marks[last_edge_id]
+            self._adjacent[v_from][v_to] = self._adjacent[v_to][v_from] = edge_id
+
+        self._edge_sources.pop()
+        self._edge_targets.pop()
+        self._edge_marks.pop()
+        self._bump_version()
+
+    def add_vertex(self):
+        self._own_arcs()
+        self._adjacent.append({})
+        self._bump_version()
+        return len(self._adjacent) - 1
+
+    def copy(self):
+        """:return UndirectedGraph sharing edges and marks with this one until any of them is changed"""
+        graph = copy.copy(self)
+        graph._is_shared = self._is_shared = True
+        graph._are_marks_shared = self._are_marks_shared = True
+        return graph
+
+    def clone(self):
+        """:return UndirectedGraph with its own edges right away, for a copy that is going to be changed anyway"""
+        graph = copy.copy(self)
+        graph._is_shared = graph._are_marks_shared = True
+        graph._own_arcs()
+        graph._own_marks()
+        return graph
+
+    def freeze(self):
+        """:return FrozenUndirectedGraph, edges keep the direction they were added with"""
+        return FrozenUndirectedGraph._from_arcs(self._edge_sources, self._edge_targets, self._edge_marks,
+                                               self.vertex_count)
+
+
+def _as_list(values):
+    return values.tolist() if hasattr(values, 'tolist') else list(values)  # array.array and numpy arrays
+
+
+def _check_arcs(sources, targets, marks, vertex_count):
+    """:return sources, targets, marks as lists and vertex count"""
+    sources, targets = _as_list(sources), _as_list(targets)
+    marks = _as_list(marks) if marks is not None else [None] * len(sources)
+    assert len(sources) == len(targets) == len(marks)
+
+    if vertex_count is None:
+        vertex_count = max(max(sources), max(targets)) + 1 if sources else 0
+    assert not sources or 0 <= min(min(sources), min(targets)) and max(max(sources), max(targets)) < vertex_count
+
+    return sources, targets, marks, vertex_count
+
+
+def _sort_arcs(sources, targets, marks, vertex_count, is_undirected):
+    """:return sources, targets, marks of arcs sorted by (source, target) and vertex count
+
+    Loops are dropped, the last mark of multiple arcs wins. Edges of undirected graph go from the lower index.
+    """
+    sources, targets, marks, vertex_count = _check_arcs(sources, targets, marks, vertex_count)
+
+    if is_undirected:
+        sources, targets = map(min, sources, targets), map(max, sources, targets)
+
+    # arc (u, v) is encoded as u * |V| + v, so sorting keys sorts arcs
+    keys = [v_from * vertex_count + v_to for v_from, v_to in itertools.izip(sources, targets)]
+    arc_marks = dict(itertools.izip(keys, marks))
+    del keys
+
+    sorted_sources, sorted_targets, sorted_marks = array.array(VERTEX_TYPECODE), array.array(VERTEX_TYPECODE), []
+
+    for key in sorted(arc_marks):
+        v_from, v_to = divmod(key, vertex_count)
+        if v_from != v_to:  # doesn't support loops
+            sorted_sources.append(v_from)
+            sorted_targets.append(v_to)
+            sorted_marks.append(arc_marks[key])
+
+    return sorted_sources, sorted_targets, sorted_marks, vertex_count
+
+
+def _as_index_array(values):
+    """:return numpy int64 array, typed arrays are viewed without copying their items one by one"""
+    if isinstance(values, array.array) and values.itemsize == numpy.dtype(numpy.int64).itemsize:
+        return numpy.frombuffer(values, dtype=values.typecode).astype(numpy.int64, copy=False)
+    return numpy.asarray(values, dtype=numpy.int64)
+
+
+def _as_typed_array(values, typecode=VERTEX_TYPECODE):
+    """:return array.array copy of a numpy array"""
+    typed_values = array.array(typecode)
+    typed_values.fromstring(buffer(numpy.ascontiguousarray(values, dtype=typecode)))
+    return typed_values
+
+
+def _unique_arcs(sources, targets, marks, vertex_count, is_undirected):
+    """:return numpy arrays of sources and targets of arcs sorted by (source, target), marks and vertex count
+
+    Loops are dropped, the last mark of multiple arcs wins. Edges of undirected graph go from the lower index.
+    Marks given by a numpy array or a typed array stay in a numpy array, other marks are returned as a list.
+    """
+    sources, targets = _as_index_array(sources), _as_index_array(targets)
+    assert len(sources) == len(targets) and (marks is None or len(marks) == len(sources))
+
+    if vertex_count is None:
+        vertex_count = int(max(sources.max(), targets.max())) + 1 if len(sources) else 0
+    assert not len(sources) or (0 <= min(sources.min(), targets.min()) and
+                                max(sources.max(), targets.max()) < vertex_count)
+
+    if is_undirected:
+        sources, targets = numpy.minimum(sources, targets), numpy.maximum(sources, targets)
+
+    # arc (u, v) is encoded as u * |V| + v, so sorting keys sorts arcs;
+    # unique keeps the first of equal keys, so reversed keys give the last of multiple arcs
+    _, last_ids = numpy.unique((sources * vertex_count + targets)[::-1], return_index=True)
+    arc_ids = len(sources) - 1 - last_ids
+    arc_ids = arc_ids[sources[arc_ids] != targets[arc_ids]]  # doesn't support loops
+
+    if marks is None:
+        marks = [None] * len(arc_ids)
+    elif isinstance(marks, numpy.ndarray):
+        marks = marks[arc_ids]
+    elif isinstance(marks, array.array) and marks.typecode in 'ld':
+        marks = numpy.frombuffer(marks, dtype=marks.typecode)[arc_ids]
+    else:
+        marks = _as_list(marks)
+        marks = [marks[arc_id] for arc_id in arc_ids.tolist()]
+
+    return sources[arc_ids], targets[arc_ids], marks, vertex_count
+
+
+def _fill_adjacent_sets(adjacent, sources, targets):
+    """set adjacent[v] to the targets of arcs going from v, arcs are sorted by source"""
+    offsets = numpy.searchsorted(sources, numpy.arange(len(adjacent) + 1)).tolist()
+    targets = targets.tolist()
+
+    for vertex_idx in xrange(len(adjacent)):
+        start, stop = offsets[vertex_idx], offsets[vertex_idx + 1]
+        if start != stop:
+            adjacent[vertex_idx] = set(targets[start:stop])
+
+
+def _fill_adjacent_dicts(adjacent, sources, targets, arc_ids):
+    """add target -> arc index of arcs going from v to adjacent[v], arcs are sorted by source"""
+    offsets = numpy.searchsorted(sources, numpy.arange(len(adjacent) + 1)).tolist()
+    targets, arc_ids = targets.tolist(), arc_ids.tolist()
+
+    for vertex_idx in xrange(len(adjacent)):
+        start, stop = offsets[vertex_idx], offsets[vertex_idx + 1]
+        if start != stop:
+            adjacent[vertex_idx].update(itertools.izip(targets[start:stop], arc_ids[start:stop]))
+
+
+def _make_mark_array(values):
+    """pack marks into a typed array if all of them are numbers, keep a list otherwise"""
+    if numpy is not None and isinstance(values, numpy.ndarray) and values.dtype.kind in 'bif':
+        return _as_typed_array(values, 'd' if values.dtype.kind == 'f' else 'l')
+    values = list(values)
+
+    if all(type(value) in (int, long) for value in values):
+        try:
+            return array.array('l', values)
+        except OverflowError:
+            return values
+    if all(type(value) in (int, long, float) for value in values):
+        return array.array('d', values)
+
+    return values
+
+
+def _store_mark(values, idx, value):
+    """:return values (or their repacked copy if value doesn't fit the container) with the value stored"""
+    try:
+        values[idx] = value
+    except (TypeError, OverflowError):
+        values = list(values)
+        values[idx] = value
+        values = _make_mark_array(values)
+    return values
+
+
+class ArcIndexedMarks(ArcMarks):
+    """marks of frozen graph arcs stored in one array by arc index
+
+    Numbers are kept in a typed array, the container is repacked once a value doesn't fit it.
+    Unlike ArcMarks it can't hold marks of arcs missing in the graph.
+    """
+    def __init__(self, graph, values):
+        assert len(values) == graph.arc_count
+        self._graph = graph
+        self._values = values
+        self._is_shared = False
+
+    @property
+    def values(self):
+        """marks by arc index, the container is replaced by reset_marks() and by storing a non-fitting value"""
+        return self._values
+
+    def _own_marks(self):
+        if self._is_shared:
+            self._values = self._values[:]
+            self._is_shared = False
+
+    def get_arc_mark(self, arc_id):
+        return self._values[arc_id]
+
+    def set_arc_mark(self, arc_id, value):
+        self._own_marks()
+        self._values = _store_mark(self._values, arc_id, value)
+
+    def get_mark(self, vertex_from, vertex_to):
+        arc_id = self._graph.get_arc_id(vertex_from, vertex_to)
+        return self._values[arc_id] if arc_id is not None else None
+
+    def set_mark(self, vertex_from, vertex_to, value):
+        arc_id = self._graph.get_arc_id(vertex_from, vertex_to)
+        if arc_id is None:
+            raise KeyError((vertex_from, vertex_to))
+        self.set_arc_mark(arc_id, value)
+
+    def del_mark(self, vertex_from, vertex_to):
+        arc_id = self._graph.get_arc_id(vertex_from, vertex_to)
+        if arc_id is not None:
+            self.set_arc_mark(arc_id, None)
+
+    def reset_marks(self, default_value=None):
+        self._values = _make_mark_array([default_value]) * len(self._values)
+        self._is_shared = False
+
+    def __iter__(self):
+        for arc, value in itertools.izip(self._graph.iter_arcs(), self._values):
+            if value is not None:
+                yield arc
+
+    def __len__(self):
+        return sum(1 for value in self._values if value is not None)
+
+
+class FrozenGraph(Graph):
+    """graph with a fixed set of arcs stored as compressed sparse rows
+
+    Forward arcs are kept in CSR form (offsets + targets sorted by vertex), reversed arcs in CSC form
+    referring to forward arc indices. Arc index is a position in the targets array; marks of arcs are
+    stored in one array by arc index, they still can be changed.
+    """
+    def __init__(self, offsets, targets, marks, reversed_offsets, reversed_sources, reversed_arc_ids):
+        assert len(offsets) == len(reversed_offsets)
+        assert len(targets) == len(marks) == len(reversed_sources) == len(reversed_arc_ids)
+        self._offsets = offsets
+        self._targets = targets
+        self._reversed_offsets = reversed_offsets
+        self._reversed_sources = reversed_sources
+        self._reversed_arc_ids = reversed_arc_ids
+        self._marks = ArcIndexedMarks(self, marks)
+        self._version = next(_version_counter)
+
+    @classmethod
+    def from_sorted_arcs(cls, vertex_count, sources, targets, marks):
+        """build graph from arcs sorted by (source, target) without duplicates and loops"""
+        arc_count = len(targets)
+        assert len(sources) == arc_count and len(marks) == arc_count
+
+        offsets = array.array(VERTEX_TYPECODE, [0]) * (vertex_count + 1)
+        reversed_offsets = array.array(VERTEX_TYPECODE, [0]) * (vertex_count + 1)
+
+        for v_from, v_to in itertools.izip(sources, targets):
+            offsets[v_from + 1] += 1
+            reversed_offsets[v_to + 1] += 1
+
+        for vertex_idx in xrange(vertex_count):
+            offsets[vertex_idx + 1] += offsets[vertex_idx]
+            reversed_offsets[vertex_idx + 1] += reversed_offsets[vertex_idx]
+
+        # counting sort by target, sources stay sorted inside every target
+        reversed_sources = array.array(VERTEX_TYPECODE, [0]) * arc_count
+        reversed_arc_ids = array.array(VERTEX_TYPECODE, [0]) * arc_count
+        positions = reversed_offsets[:-1]
+
+        for arc_id, (v_from, v_to) in enumerate(itertools.izip(sources, targets)):
+            position = positions[v_to]
+            reversed_sources[position] = v_from
+            reversed_arc_ids[position] = arc_id
+            positions[v_to] = position + 1
+
+        return cls(offsets, array.array(VERTEX_TYPECODE, targets), _make_mark_array(marks),
+                   reversed_offsets, reversed_sources, reversed_arc_ids)
+
+    @classmethod
+    def from_edges(cls, sources, targets, marks=None, vertex_count=None):
+        return cls._from_arcs(sources, targets, marks, vertex_count, issubclass(cls, UndirectedGraph))
+
+    @classmethod
+    def _from_arcs(cls, sources, targets, marks=None, vertex_count=None, is_undirected=False):
+        """build graph from arc arrays, arcs keep their direction unless is_undirected is set
+
+        Undirected graph may be built from arcs if there is one arc per edge, e.g. to keep the direction of edges.
+        """
+        if numpy is not None:
+            sources, targets, marks, vertex_count = _unique_arcs(sources, targets, marks, vertex_count, is_undirected)
+
+            vertices = numpy.arange(vertex_count + 1)
+            reversed_arc_ids = numpy.argsort(targets, kind='mergesort')  # sources stay sorted inside every target
+            reversed_offsets = numpy.searchsorted(targets[reversed_arc_ids], vertices)
+
+            return cls(_as_typed_array(numpy.searchsorted(sources, vertices)), _as_typed_array(targets),
+                       _make_mark_array(marks), _as_typed_array(reversed_offsets),
+                       _as_typed_array(sources[reversed_arc_ids]), _as_typed_array(reversed_arc_ids))
+
+        sorted_sources, sorted_targets, sorted_marks, vertex_count = _sort_arcs(
+            sources, targets, marks, vertex_count, is_undirected)
+        return cls.from_sorted_arcs(vertex_count, sorted_sources, sorted_targets, sorted_marks)
+
+    @classmethod
+    def from_graph(cls, graph):
+        assert isinstance(graph, Graph)
+        sources, targets, marks = array.array(VERTEX_TYPECODE), array.array(VERTEX_TYPECODE), []
+
+        for v_from in xrange(len(graph)):
+            for v_to in sorted(graph.get_forward(v_from)):
+                sources.append(v_from)
+                targets.append(v_to)
+                marks.append(graph.get_mark(v_from, v_to))
+
+        return cls.from_sorted_arcs(len(graph), sources, targets, marks)
+
+    def get_csr_arrays(self):
+        """:return offsets, targets, reversed offsets, reversed sources, reversed arc ids"""
+        return (self._offsets, self._targets,
+                self._reversed_offsets, self._reversed_sources, self._reversed_arc_ids)
+
+    @property
+    def arc_count(self):
+        return len(self._targets)
+
+    def __iter__(self):
+        for vertex_idx in xrange(self.vertex_count):
+            yield self.get_forward(vertex_idx)
+
+    @property
+    def vertex_count(self):
+        return len(self._offsets) - 1
+
+    def get_forward(self, vertex_idx):
+        return self._targets[self._offsets[vertex_idx]:self._offsets[vertex_idx + 1]]
+
+    def get_backward(self, vertex_idx):
+        return self._reversed_sources[self._reversed_offsets[vertex_idx]:self._reversed_offsets[vertex_idx + 1]]
+
+    def get_arc_id(self, vertex_from, vertex_to):
+        """:return index of the arc or None if there is no such arc"""
+        lo, hi = self._offsets[vertex_from], self._offsets[vertex_from + 1]
+        arc_id = bisect.bisect_left(self._targets, vertex_to, lo, hi)
+        if arc_id < hi and self._targets[arc_id] == vertex_to:
+            return arc_id
+        return None
+
+    def has(self, vertex_from, vertex_to):
+        return self.get_arc_id(vertex_from, vertex_to) is not None
+
+    def iter_arcs(self):
+        """iterate (vertex_from, vertex_to) in arc index order"""
+        for v_from in xrange(self.vertex_count):
+            for v_to in self.get_forward(v_from):
+                yield v_from, v_to
+
+    def iter_forward_arcs(self, vertex_idx):
+        """iterate (vertex_to, arc index) over arcs going from the vertex"""
+        lo, hi = self._offsets[vertex_idx], self._offsets[vertex_idx + 1]
+        return itertools.izip(self._targets[lo:hi], xrange(lo, hi))
+
+    def iter_backward_arcs(self, vertex_idx):
+        """iterate (vertex_from, arc index) over arcs coming to the vertex"""
+        lo, hi = self._reversed_offsets[vertex_idx], self._reversed_offsets[vertex_idx + 1]
+        return itertools.izip(self._reversed_sources[lo:hi], self._reversed_arc_ids[lo:hi])
+
+    def iter_forward_marks(self, vertex_idx):
+        lo, hi = self._offsets[vertex_idx], self._offsets[vertex_idx + 1]
+        return itertools.izip(self._targets[lo:hi], self._marks.values[lo:hi])
+
+    def iter_backward_marks(self, vertex_idx):
+        lo, hi = self._reversed_offsets[vertex_idx], self._reversed_offsets[vertex_idx + 1]
+        marks = self._marks.values
+        return itertools.izip(self._reversed_sources[lo:hi],
+                              [marks[arc_id] for arc_id in self._reversed_arc_ids[lo:hi]])
+
+    def get_mark_collection(self):
+        """:return ArcIndexedMarks"""
+        return self._marks.copy()
+
+    def get_arc_mark(self, arc_id):
+        return self._marks.get_arc_mark(arc_id)
+
+    def set_arc_mark(self, arc_id, value):
+        self._marks.set_arc_mark(arc_id, value)
+        self._bump_version()
+
+    def add(self, vertex_from, vertex_to, value=None):
+        raise TypeError('arcs of a frozen graph can not be changed')
+
+    def remove(self, vertex_from, vertex_to):
+        raise TypeError('arcs of a frozen graph can not be changed')
+
+    def add_vertex(self):
+        raise TypeError('vertices of a frozen graph can not be changed')
+
+    def copy(self):
+        """:return FrozenGraph, arcs are shared with this graph, marks are shared until changed"""
+        graph = copy.copy(self)
+        graph._marks = self._marks.copy()
+        return graph
+
+    def clone(self):
+        return self.copy()
+
+    def freeze(self):
+        return self
+
+
+class FrozenUndirectedGraph(FrozenGraph, UndirectedGraph):
+    """undirected graph with a fixed set of edges, every edge is stored once as an arc"""
+    def __iter__(self):
+        for vertex_idx in xrange(self.vertex_count):
+            yield self.get_adjacent(vertex_idx)
+
+    def get_adjacent(self, vertex_idx):
+        return itertools.chain(self.get_forward(vertex_idx), self.get_backward(vertex_idx))
+
+    def iter_arc_marks(self, vertex_idx):
+        return itertools.chain(self.iter_forward_marks(vertex_idx), self.iter_backward_marks(vertex_idx))
+
+    def get_arc_id(self, vertex_from, vertex_to):
+        arc_id = FrozenGraph.get_arc_id(self, vertex_from, vertex_to)
+        if arc_id is None:
+            arc_id = FrozenGraph.get_arc_id(self, vertex_to, vertex_from)
+        return arc_id
+
+    def has(self, vertex_from, vertex_to):
+        return self.get_arc_id(vertex_from, vertex_to) is not None
+
+    def get_mark(self, vertex_from, vertex_to):
+        return self._marks.get_mark(vertex_from, vertex_to)
+
+    def set_mark(self, vertex_from, vertex_to, value):
+        self._marks.set_mark(vertex_from, vertex_to, value)
+        self._bump_version()
+
+
+class OverlayGraph(Graph):
+    """directed view of a base graph with extra vertices and arcs, the base graph isn't changed
+
+    Extra arcs and changed marks of base arcs are kept by the overlay, base arcs can't be removed.
+    Every edge of an undirected base graph is seen as two arcs, their marks are changed separately.
+    Base graph must not be changed while the overlay is used.
+    """
+    def __init__(self, base_graph, extra_vertex_count=0):
+        assert isinstance(base_graph, Graph)
+        self._base_graph = base_graph
+        self._base_vertex_count = len(base_graph)
+        self._is_base_undirected = isinstance(base_graph, UndirectedGraph)
+        self._extra_vertex_count = extra_vertex_count
+        self._extra_arcs = collections.defaultdict(set)
+        self._extra_reversed_arcs = collections.defaultdict(set)
+        self._marks = ArcMarks()  # marks of extra arcs and changed marks of base arcs
+        self._version = next(_version_counter)
+
+    @property
+    def base_graph(self):
+        return self._base_graph
+
+    def _is_base_arc(self, vertex_from, vertex_to):
+        return (vertex_from < self._base_vertex_count and vertex_to < self._base_vertex_count and
+                self._base_graph.has(vertex_from, vertex_to))
+
+    @property
+    def arc_count(self):
+        base_arc_count = self._base_graph.arc_count * (2 if self._is_base_undirected else 1)
+        return base_arc_count + sum(map(len, self._extra_arcs.itervalues()))
+
+    def __iter__(self):
+        for vertex_idx in xrange(self.vertex_count):
+            yield self.get_forward(vertex_idx)
+
+    @property
+    def vertex_count(self):
+        return self._base_vertex_count + self._extra_vertex_count
+
+    def _join(self, vertex_idx, base_vertices, extra_vertices):
+        base_vertices = base_vertices(vertex_idx) if vertex_idx < self._base_vertex_count else ()
+        extra_vertices = extra_vertices.get(vertex_idx)
+        if not extra_vertices:
+            return base_vertices
+        return extra_vertices.union(base_vertices)
+
+    def _get_base_adjacent(self, vertex_idx):
+        adjacent = self._base_graph.get_adjacent(vertex_idx)
+        return adjacent if isinstance(adjacent, dict) else set(adjacent)  # frozen graphs chain two slices
+
+    def _get_base_forward(self, vertex_idx):
+        if self._is_base_undirected:
+            return self._get_base_adjacent(vertex_idx)
+        return self._base_graph.get_forward(vertex_idx)
+
+    def _get_base_backward(self, vertex_idx):
+        if self._is_base_undirected:
+            return self._get_base_adjacent(vertex_idx)
+        return self._base_graph.get_backward(vertex_idx)
+
+    def _iter_base_forward_marks(self, vertex_idx):
+        if self._is_base_undirected:
+            return self._base_graph.iter_arc_marks(vertex_idx)
+        return self._base_graph.iter_forward_marks(vertex_idx)
+
+    def _iter_base_backward_marks(self, vertex_idx):
+        if self._is_base_undirected:
+            return self._base_graph.iter_arc_marks(vertex_idx)
+        return self._base_graph.iter_backward_marks(vertex_idx)
+
+    def get_forward(self, vertex_idx):
+        return self._join(vertex_idx, self._get_base_forward, self._extra_arcs)
+
+    def get_backward(self, vertex_idx):
+        return self._join(vertex_idx, self._get_base_backward, self._extra_reversed_arcs)
+
+    def has(self, vertex_from, vertex_to):
+        return vertex_to in self._extra_arcs.get(vertex_from, ()) or self._is_base_arc(vertex_from, vertex_to)
+
+    def iter_forward_marks(self, vertex_idx):
+        changed_marks = self._marks._marks
+        if vertex_idx < self._base_vertex_count:
+            for v_to, mark in self._iter_base_forward_marks(vertex_idx):
+                yield v_to, changed_marks.get((vertex_idx, v_to), mark)
+        for v_to in self._extra_arcs.get(vertex_idx, ()):
+            yield v_to, changed_marks.get((vertex_idx, v_to))
+
+    def iter_backward_marks(self, vertex_idx):
+        changed_marks = self._marks._marks
+        if vertex_idx < self._base_vertex_count:
+            for v_from, mark in self._iter_base_backward_marks(vertex_idx):
+                yield v_from, changed_marks.get((v_from, vertex_idx), mark)
+        for v_from in self._extra_reversed_arcs.get(vertex_idx, ()):
+            yield v_from, changed_marks.get((v_from, vertex_idx))
+
+    def iter_arc_marks(self, vertex_idx):
+        return self.iter_forward_marks(vertex_idx)
+
+    def get_mark_collection(self):
+        """:return ArcMarks with marks of base and extra arcs"""
+        marks = ArcMarks()
+        for v_from in xrange(self.vertex_count):
+            for v_to, mark in self.iter_forward_marks(v_from):
+                if mark is not None:
+                    marks.set_mark(v_from, v_to, mark)
+        return marks
+
     def get_mark(self, vertex_from, vertex_to):
-        if vertex_to not in self.get_forward(vertex_from):
-            vertex_from, vertex_to = vertex_to, vertex_from
-        mark = super(UndirectedGraph, self).get_mark(vertex_from, vertex_to)
-        return mark
+        changed_marks = self._marks._marks
+        if (vertex_from, vertex_to) in changed_marks:
+            return changed_marks[(vertex_from, vertex_to)]
+        if vertex_from < self._base_vertex_count and vertex_to < self._base_vertex_count:
+            return self._base_graph.get_mark(vertex_from, vertex_to)
+        return None
 
     def set_mark(self, vertex_from, vertex_to, value):
-        if vertex_to not in self.get_forward(vertex_from):
-            vertex_from, vertex_to = vertex_to, vertex_from
-        super(UndirectedGraph, self).set_mark(vertex_from, vertex_to, value)
+        self._marks.set_mark(vertex_from, vertex_to, value)
+        self._bump_version()
+
+    def add(self, vertex_from, vertex_to, value=None):
+        if vertex_from != vertex_to:  # doesn't support loops
+            if not self._is_base_arc(vertex_from, vertex_to):
+                self._extra_arcs[vertex_from].add(vertex_to)
+                self._extra_reversed_arcs[vertex_to].add(vertex_from)
+            if value is not None:
+                self._marks.set_mark(vertex_from, vertex_to, value)
+            self._bump_version()
+
+    def remove(self, vertex_from, vertex_to):
+        if vertex_to not in self._extra_arcs.get(vertex_from, ()):
+            raise TypeError('arcs of the base graph can not be removed through an overlay')
+        self._extra_arcs[vertex_from].remove(vertex_to)
+        self._extra_reversed_arcs[vertex_to].remove(vertex_from)
+        self._marks.del_mark(vertex_from, vertex_to)
+        self._bump_version()
+
+    def add_vertex(self):
+        self._extra_vertex_count += 1
+        self._bump_version()
+        return self.vertex_count - 1
+
+    def copy(self):
+        """:return OverlayGraph over the same base graph"""
+        graph = copy.copy(self)
+        graph._extra_arcs = collections.defaultdict(set, ((vertex_idx, set(vertices))
+                                                          for vertex_idx, vertices in self._extra_arcs.iteritems()))
+        graph._extra_reversed_arcs = collections.defaultdict(
+            set, ((vertex_idx, set(vertices)) for vertex_idx, vertices in self._extra_reversed_arcs.iteritems()))
+        graph._marks = self._marks.copy()
+        return graph
+
+    def clone(self):
+        return self.copy()
+
+
+class TestCase(unittest.TestCase):
+    def test_version(self):
+        for graph in (Graph(3), UndirectedGraph(3), OverlayGraph(Graph(2), 1)):
+            versions = [graph.version]
+            graph.add(0, 1, 2)
+            versions.append(graph.version)
+            graph.set_mark(0, 1, 3)
+            versions.append(graph.version)
+            graph.add(1, 2)
+            versions.append(graph.version)
+            graph.remove(1, 2)
+            versions.append(graph.version)
+
+            graph_copy = graph.copy()
+            self.assertEqual(graph.version, graph_copy.version)
+
+            graph_copy.add_vertex()
+            versions.append(graph_copy.version)
+
+            self.assertEqual(len(versions), len(set(versions)))
+            self.assertEqual(versions[-2], graph.version)
+
+        frozen_graph = graph.freeze()
+        version = frozen_graph.version
+        frozen_graph.set_mark(0, 1, 5)
+
+        self.assertNotEqual(version, frozen_graph.version)
+
+    def test_freeze(self):
+        graph = Graph(4)
+
+        graph.add(0, 2, 5)
+        graph.add(0, 1, 3)
+        graph.add(2, 1, -1.5)
+        graph.add(3, 0)
+
+        frozen_graph = graph.freeze()
+
+        self.assertEqual(graph.arc_count, frozen_graph.arc_count)
+        self.assertEqual([[1, 2], [], [1], [0]], [list(v_to_collection) for v_to_collection in frozen_graph])
+        self.assertEqual([0, 2], list(frozen_graph.get_backward(1)))
+        self.assertEqual([(0, 3), (2, -1.5)], list(frozen_graph.iter_backward_marks(1)))
+        self.assertTrue(frozen_graph.has(2, 1))
+        self.assertFalse(frozen_graph.has(1, 2))
+        self.assertIsNone(frozen_graph.get_mark(3, 0))
+        self.assertEqual(dict(graph.get_mark_collection()), dict(frozen_graph.get_mark_collection()))
+
+        frozen_graph.set_mark(3, 0, 7)
+        self.assertEqual(7, frozen_graph.get_mark(3, 0))
+        self.assertRaises(KeyError, frozen_graph.set_mark, 0, 3, 1)
+        self.assertRaises(TypeError, frozen_graph.add, 1, 3, 1)
+
+    def test_from_edges(self):
+        sources = array.array(VERTEX_TYPECODE, [2, 0, 1, 0, 2, 3])
+        targets = [1, 2, 1, 2, 3, 0]
+        marks = (4, 5, 6, 7, 8, None)
+
+        graph = Graph.from_edges(sources, targets, marks)
+
+        self.assertEqual(4, len(graph))
+        self.assertEqual([{2}, set(), {1, 3}, {0}], list(graph))  # loop (1, 1) is dropped
+        self.assertEqual({(0, 2): 7, (2, 1): 4, (2, 3): 8}, dict(graph.get_mark_collection()))
+
+        frozen_graph = FrozenGraph.from_edges(sources, targets, marks, vertex_count=5)
+
+        self.assertEqual(5, len(frozen_graph))
+        self.assertEqual([[2], [], [1, 3], [0], []], [list(v_to_collection) for v_to_collection in frozen_graph])
+        self.assertEqual(7, frozen_graph.get_mark(0, 2))
+
+        undirected_graph = UndirectedGraph.from_edges([0, 1, 2], [1, 0, 1], [1, 2, 3])
+
+        self.assertEqual(2, undirected_graph.edge_count)
+        self.assertEqual(2, undirected_graph.get_mark(0, 1))
+        self.assertEqual(3, FrozenUndirectedGraph.from_edges([0, 1, 2], [1, 0, 1], [1, 2, 3]).get_mark(2, 1))
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_from_numpy_edges(self):
+        random_state = numpy.random.RandomState(3)
+        sources, targets = random_state.randint(0, 20, 200), random_state.randint(0, 20, 200)
+        marks = random_state.rand(200)
+
+        for graph_type in (Graph, UndirectedGraph):
+            expected_graph = graph_type(20)
+            for v_from, v_to, mark in zip(sources.tolist(), targets.tolist(), marks.tolist()):
+                expected_graph.add(v_from, v_to, mark)
+
+            for graph in (graph_type.from_edges(sources, targets, marks, 20), expected_graph.freeze()):
+                self.assertEqual(expected_graph.arc_count, graph.arc_count)
+                self.assertEqual(sorted(map(sorted, expected_graph)), sorted(map(sorted, graph)))
+                if graph_type is Graph:  # undirected edges are built going from the lower index
+                    self.assertEqual([sorted(expected_graph.get_backward(vertex_idx)) for vertex_idx in xrange(20)],
+                                     [sorted(graph.get_backward(vertex_idx)) for vertex_idx in xrange(20)])
+                for v_from, v_to in zip(sources.tolist(), targets.tolist()):
+                    self.assertEqual(expected_graph.get_mark(v_from, v_to), graph.get_mark(v_from, v_to))
+
+    def test_undirected(self):
+        graph = UndirectedGraph(4)
+
+        graph.add(0, 1, 2)
+        graph.add(2, 1, 4)
+        graph.add(1, 0, 3)  # the same edge, mark is updated
+        graph.add(3, 0, 5)
+
+        self.assertEqual(3, graph.edge_count)
+        self.assertEqual(3, graph.get_mark(1, 0))
+        self.assertEqual({0, 2}, set(graph[1]))
+        self.assertEqual({1}, graph.get_forward(0))
+        self.assertEqual({3}, graph.get_backward(0))
+        self.assertEqual([(0, 3), (2, 4)], sorted(graph.iter_arc_marks(1)))
+
+        graph_copy = graph.copy()
+        graph_copy.remove(1, 0)
+        graph_copy.set_mark(3, 0, 6)
+
+        self.assertEqual(2, graph_copy.edge_count)
+        self.assertFalse(graph_copy.has(0, 1))
+        self.assertEqual(6, graph_copy.get_mark(0, 3))
+        self.assertEqual(4, graph_copy.get_mark(1, 2))
+        self.assertEqual({(2, 1): 4, (3, 0): 6}, dict(graph_copy.get_mark_collection()))
+        self.assertEqual({(0, 1): 3, (2, 1): 4, (3, 0): 5}, dict(graph.get_mark_collection()))
+
+    def test_copy_on_write(self):
+        graph = Graph(3)
+
+        graph.add(0, 1, 4)
+        graph.add(1, 2, 6)
+
+        graph_copy = graph.copy()
+        self.assertIs(graph._arcs, graph_copy._arcs)
+
+        graph_copy.add(2, 0, 1)
+        graph_copy.set_mark(0, 1, 5)
+        graph.remove(1, 2)
+
+        self.assertEqual([{1}, set(), set()], list(graph))
+        self.assertEqual({(0, 1): 4}, dict(graph.get_mark_collection()))
+        self.assertEqual([{1}, {2}, {0}], list(graph_copy))
+        self.assertEqual({(0, 1): 5, (1, 2): 6, (2, 0): 1}, dict(graph_copy.get_mark_collection()))
+
+        graph_clone = graph_copy.clone()
+        self.assertIsNot(graph_copy._arcs, graph_clone._arcs)
+        graph_clone.remove(2, 0)
+        self.assertTrue(graph_copy.has(2, 0))
+
+        frozen_graph = graph_copy.freeze()
+        frozen_copy = frozen_graph.copy()
+        frozen_copy.set_mark(2, 0, 3)
+        self.assertEqual(1, frozen_graph.get_mark(2, 0))
+        self.assertEqual(3, frozen_copy.get_mark(2, 0))
+
+    def test_overlay(self):
+        graph = Graph(3)
+
+        graph.add(0, 1, 4)
+        graph.add(1, 2, 6)
+
+        overlay_graph = OverlayGraph(graph)
+        new_vertex = overlay_graph.add_vertex()
+        overlay_graph.add(new_vertex, 0, 1)
+        overlay_graph.add(2, new_vertex, 2)
+        overlay_graph.set_mark(0, 1, 5)
+
+        self.assertEqual(3, len(graph))
+        self.assertEqual(4, len(overlay_graph))
+        self.assertEqual(4, overlay_graph.arc_count)
+        self.assertEqual([{1}, {2}, {3}, {0}], [set(v_to_collection) for v_to_collection in overlay_graph])
+        self.assertEqual({3}, set(overlay_graph.get_backward(0)))
+        self.assertEqual(5, overlay_graph.get_mark(0, 1))
+        self.assertEqual(4, graph.get_mark(0, 1))
+        self.assertEqual([(1, 5)], list(overlay_graph.iter_forward_marks(0)))
+        self.assertEqual({(0, 1): 5, (1, 2): 6, (3, 0): 1, (2, 3): 2}, dict(overlay_graph.get_mark_collection()))
+        self.assertRaises(TypeError, overlay_graph.remove, 0, 1)
+
+        frozen_graph = overlay_graph.freeze()
+        self.assertEqual([[1], [2], [3], [0]], [list(v_to_collection) for v_to_collection in frozen_graph])
+
+        self.assertEqual(3, graph.add_vertex())
+        graph.add(3, 0)
+        self.assertEqual({3}, graph.get_backward(0))
+
+    def test_arc_indexed_marks(self):
+        graph = Graph(3)
+
+        graph.add(0, 1, 4)
+        graph.add(1, 2, 6)
+        graph.add(2, 0)
+
+        frozen_graph = graph.freeze()
+        marks = frozen_graph.get_mark_collection()
+
+        self.assertIsInstance(marks, ArcIndexedMarks)
+        self.assertEqual({(0, 1): 4, (1, 2): 6}, dict(marks))
+
+        marks.reset_marks(0)
+        self.assertIsInstance(marks.values, array.array)
+        marks[(2, 0)] += 3
+        marks.set_arc_mark(frozen_graph.get_arc_id(0, 1), 1.5)
+
+        self.assertEqual({(0, 1): 1.5, (1, 2): 0, (2, 0): 3}, dict(marks))
+        self.assertEqual(4, frozen_graph.get_mark(0, 1))  # collection is a copy
+        self.assertRaises(KeyError, marks.set_mark, 0, 2, 1)
+
+    def test_freeze_undirected(self):
+        graph = UndirectedGraph(3)
+
+        graph.add(0, 1, 2)
+        graph.add(2, 1, 4)
+
+        frozen_graph = graph.freeze()
+
+        self.assertIsInstance(frozen_graph, UndirectedGraph)
+        self.assertEqual(2, frozen_graph.edge_count)
+        self.assertEqual(4, frozen_graph.get_mark(1, 2))
+        self.assertEqual([0, 2], sorted(frozen_graph[1]))
+        self.assertEqual([(0, 2), (2, 4)], sorted(frozen_graph.iter_arc_marks(1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
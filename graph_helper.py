@@ -2,7 +2,12 @@
 import unittest
 import itertools
 import collections
-from graph import Graph, UndirectedGraph
+from graph import Graph, UndirectedGraph, OverlayGraph
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 ARC_FLOW_LIMIT = 0xFFFFFFFF
 ARC_COST_LIMIT = 0xFFFFFFFF
@@ -33,6 +38,24 @@ def transpose(matrix):
     return transposed
 
 
+def _new_graph_like(graph, vertex_count):
+    """:return empty mutable graph of the same kind (directed or not)"""
+    return UndirectedGraph(vertex_count) if isinstance(graph, UndirectedGraph) else Graph(vertex_count)
+
+
+def _mutable_copy(graph):
+    """:return mutable graph of the same kind with the same arcs, to be changed in place"""
+    if type(graph) in (Graph, UndirectedGraph):
+        return graph.clone()
+
+    new_graph = _new_graph_like(graph, len(graph))
+    for v_from in xrange(len(graph)):
+        for v_to, weight in graph.iter_forward_marks(v_from):
+            new_graph.add(v_from, v_to, weight)
+
+    return new_graph
+
+
 def merge_vertices(graph, *vertex_indices):
     """replace some vertices with one merging their arcs
 
@@ -44,7 +67,7 @@ def merge_vertices(graph, *vertex_indices):
 
     target_vertex, vertex_to_remove = min(vertex_indices), max(vertex_indices)
 
-    new_graph = type(graph)(len(graph) - 1)
+    new_graph = _new_graph_like(graph, len(graph) - 1)
 
     for v_from in xrange(len(graph)):
         for v_to in graph.get_forward(v_from):
@@ -81,16 +104,14 @@ def split_vertex(graph, vertex_idx, new_weight=None, add_reversed=False):
     :param add_reversed: Add an edge (instead of just arc) between split vertices
     """
     assert isinstance(graph, Graph)
-    target_vertex = len(graph)
 
-    new_graph = type(graph)(len(graph) + 1)
+    new_graph = _mutable_copy(graph)
+    target_vertex = new_graph.add_vertex()
 
-    for v_from in xrange(len(graph)):
-        for v_to in graph.get_forward(v_from):
-            weight = graph.get_mark(v_from, v_to)
-            if v_from == vertex_idx:
-                v_from = target_vertex
-            new_graph.add(v_from, v_to, weight)
+    # move arcs going from the vertex to the new one
+    for v_to, weight in list(new_graph.iter_forward_marks(vertex_idx)):
+        new_graph.remove(vertex_idx, v_to)
+        new_graph.add(target_vertex, v_to, weight)
 
     new_graph.add(vertex_idx, target_vertex, new_weight)
     if add_reversed:
@@ -100,14 +121,15 @@ def split_vertex(graph, vertex_idx, new_weight=None, add_reversed=False):
 
 
 def add_new_vertex(graph):
-    """add new stand-alone vertex"""
+    """add new stand-alone vertex
+
+    :return OverlayGraph over the original graph, which isn't changed or copied
+    """
     assert isinstance(graph, Graph)
-    new_graph = Graph(len(graph) + 1)
 
-    for v_from, v_to_collection in enumerate(graph):
-        for v_to in v_to_collection:
-            weight = graph.get_mark(v_from, v_to)
-            new_graph.add(v_from, v_to, weight)
+    # overlays are not nested, their own (small) extra arcs are copied instead
+    new_graph = graph.copy() if isinstance(graph, OverlayGraph) else OverlayGraph(graph)
+    new_graph.add_vertex()
 
     return new_graph
 
@@ -132,6 +154,26 @@ def add_new_target(graph, targets, arc_weight=ARC_FLOW_LIMIT):
     return expanded_graph, new_vertex_idx
 
 
+def get_arc_arrays(graph):
+    """:return numpy arrays (sources, targets, marks) of all arcs, both arcs of every edge for undirected graphs"""
+    assert numpy is not None, "numpy is required"
+    assert isinstance(graph, Graph)
+
+    graph = graph.freeze()
+    offsets, targets, _, _, _ = graph.get_csr_arrays()
+
+    offsets = numpy.asarray(offsets[:], dtype=numpy.int64)
+    targets = numpy.asarray(targets[:], dtype=numpy.int64)
+    sources = numpy.repeat(numpy.arange(len(graph), dtype=numpy.int64), numpy.diff(offsets))
+    marks = numpy.asarray(graph.get_mark_collection().values[:])
+
+    if isinstance(graph, UndirectedGraph):
+        sources, targets = numpy.concatenate((sources, targets)), numpy.concatenate((targets, sources))
+        marks = numpy.concatenate((marks, marks))
+
+    return sources, targets, marks
+
+
 def make_bipartite_graph_from_matrix(matrix):
     left_part_size = len(matrix)
     right_part_size = len(matrix[0])
@@ -206,6 +248,53 @@ class TestCase(unittest.TestCase):
 
         self.assertFalse(has_cycle(graph))
 
+    def test_add_new_source_and_target(self):
+        graph = Graph(3)
+
+        graph.add(0, 1, 5)
+        graph.add(1, 2, 3)
+
+        expanded_graph, new_source = add_new_source(graph, [0, 1], 7)
+        expanded_graph, new_target = add_new_target(expanded_graph, [2], 8)
+
+        self.assertEqual((3, 4), (new_source, new_target))
+        self.assertEqual(3, len(graph))
+        self.assertEqual(2, graph.arc_count)
+        self.assertEqual(5, len(expanded_graph))
+        self.assertEqual({0, 1}, set(expanded_graph.get_forward(new_source)))
+        self.assertEqual({1, 4}, set(expanded_graph.get_backward(2) | expanded_graph.get_forward(2)))
+        self.assertEqual(8, expanded_graph.get_mark(2, new_target))
+
+    def test_add_new_source_undirected(self):
+        graph = UndirectedGraph(3)
+
+        graph.add(1, 0, 5)
+        graph.add(2, 1, 3)
+
+        expanded_graph, new_source = add_new_source(graph, [2], 7)
+        expanded_graph.set_mark(0, 1, 4)
+
+        self.assertEqual(5, expanded_graph.arc_count)
+        self.assertEqual({0, 2}, set(expanded_graph.get_forward(1)))
+        self.assertEqual({1, new_source}, set(expanded_graph.get_backward(2)))
+        self.assertEqual([(0, 5), (2, 3)], sorted(expanded_graph.iter_forward_marks(1)))
+        self.assertEqual([(1, 4)], list(expanded_graph.iter_forward_marks(0)))
+        self.assertEqual(5, expanded_graph.get_mark(1, 0))
+        self.assertEqual(5, graph.get_mark(0, 1))
+
+    def test_split_vertex(self):
+        graph = Graph(3)
+
+        graph.add(0, 1, 5)
+        graph.add(1, 2, 3)
+
+        new_graph = split_vertex(graph, 1, 4)
+
+        self.assertEqual([{1}, {3}, set(), {2}], list(new_graph))
+        self.assertEqual(3, new_graph.get_mark(3, 2))
+        self.assertEqual(4, new_graph.get_mark(1, 3))
+        self.assertEqual([{1}, {2}, set()], list(graph))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,556 @@
+
+import os
+import sys
+import gzip
+import mmap
+import array
+import struct
+import unittest
+import tempfile
+import itertools
+from collections import namedtuple
+
+from graph import Graph, UndirectedGraph, ArcMarks, ArcIndexedMarks, FrozenGraph, FrozenUndirectedGraph, VERTEX_TYPECODE
+
+# binary graph format, all numbers are little-endian:
+#   header: magic, version, flags, vertex count, arc count, mark layer count
+#   mark layer typecodes, one byte per layer: 'l' - int64, 'd' - float64, 'n' - no marks (all None)
+#   sections padded to 8 bytes: offsets, targets, reversed offsets, reversed sources, reversed arc ids,
+#   then one section per mark layer (empty for 'n')
+MAGIC = 'GRPH'
+VERSION = 1
+FLAG_UNDIRECTED = 0x1
+
+_HEADER = struct.Struct('<4sHHqqq')
+_ITEM_SIZE = 8
+_LAYER_TYPECODES = ('l', 'd', 'n')
+_ITEM_FORMATS = {VERTEX_TYPECODE: 'q', 'd': 'd'}  # typed array items are stored as int64 and float64
+
+
+def _is_native(typecode):
+    """:return whether typed array items are stored as is, they are converted by struct otherwise"""
+    return sys.byteorder == 'little' and array.array(typecode).itemsize == _ITEM_SIZE
+
+
+class MappedArray(object):
+    """read-only typed array over a buffer (e.g. mmap) that doesn't copy data
+
+    Slices are copied into array.array, so row access of a frozen graph costs one copy of the row only.
+    """
+    def __init__(self, mapped, offset, typecode, length):
+        self._mapped = mapped
+        self._offset = offset
+        self._typecode = typecode
+        self._length = length
+        self._item = struct.Struct('<' + _ITEM_FORMATS[typecode])
+        self._is_native = _is_native(typecode)
+
+    @property
+    def typecode(self):
+        return self._typecode
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(self._length)
+            assert step == 1
+            values = array.array(self._typecode)
+            if start < stop and self._is_native:
+                values.fromstring(self._mapped[self._offset + start * _ITEM_SIZE:self._offset + stop * _ITEM_SIZE])
+            elif start < stop:
+                values.extend(struct.unpack_from('<%d%s' % (stop - start, _ITEM_FORMATS[self._typecode]),
+                                                 self._mapped, self._offset + start * _ITEM_SIZE))
+            return values
+
+        if idx < 0:
+            idx += self._length
+        if not 0 <= idx < self._length:
+            raise IndexError('mapped array index out of range')
+        return self._item.unpack_from(self._mapped, self._offset + idx * _ITEM_SIZE)[0]
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+def _write_section(stream, values, typecode):
+    if not _is_native(typecode):
+        stream.write(struct.pack('<%d%s' % (len(values), _ITEM_FORMATS[typecode]), *values))
+        return
+
+    if not isinstance(values, array.array) or values.typecode != typecode:
+        values = array.array(typecode, values)
+    values.tofile(stream)
+
+
+def _pack_layer(values):
+    """:return (typecode, values) of a mark layer"""
+    if isinstance(values, (array.array, MappedArray)):
+        return values.typecode, values
+    if all(value is None for value in values):
+        return 'n', ()
+
+    for typecode in _LAYER_TYPECODES[:-1]:
+        try:
+            return typecode, array.array(typecode, values)
+        except (TypeError, OverflowError):
+            pass
+
+    raise ValueError('only numeric marks (or no marks at all) can be saved')
+
+
+def _get_layer_mark(marks, v_from, v_to, is_undirected):
+    """:return mark of the arc, an edge of undirected graph may be keyed in any direction"""
+    mark = marks.get_mark(v_from, v_to)
+    if mark is None and is_undirected:
+        mark = marks.get_mark(v_to, v_from)
+    return mark
+
+
+def save_graph(path, graph, *mark_collections):
+    """save graph with its marks and extra mark layers (ArcMarks of the same arcs)
+
+    :return FrozenGraph that was saved
+    """
+    assert isinstance(graph, Graph)
+    graph = graph.freeze()
+
+    is_undirected = isinstance(graph, UndirectedGraph)
+
+    layers = [graph.get_mark_collection().values]
+    for marks in mark_collections:
+        assert isinstance(marks, ArcMarks)
+        layers.append([_get_layer_mark(marks, v_from, v_to, is_undirected) for v_from, v_to in graph.iter_arcs()])
+
+    layer_typecodes, layers = zip(*map(_pack_layer, layers))
+
+    flags = FLAG_UNDIRECTED if is_undirected else 0
+
+    with open(path, 'wb') as stream:
+        stream.write(_HEADER.pack(MAGIC, VERSION, flags, graph.vertex_count, graph.arc_count, len(layers)))
+        stream.write(''.join(layer_typecodes))
+        stream.write('\0' * (-stream.tell() % _ITEM_SIZE))
+
+        for values in graph.get_csr_arrays():
+            _write_section(stream, values, VERTEX_TYPECODE)
+
+        for typecode, values in zip(layer_typecodes, layers):
+            if typecode != 'n':
+                _write_section(stream, values, typecode)
+
+    return graph
+
+
+def load_graph(path):
+    """map saved graph into memory without reading it, pages are shared by all processes mapping the file
+
+    :return (FrozenGraph, list of ArcIndexedMarks) - graph and extra mark layers
+    """
+    with open(path, 'rb') as stream:
+        mapped = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(mapped) < _HEADER.size:
+        raise ValueError('%s is not a saved graph' % path)
+
+    magic, version, flags, vertex_count, arc_count, layer_count = _HEADER.unpack_from(mapped, 0)
+    if magic != MAGIC:
+        raise ValueError('%s is not a saved graph' % path)
+    if version != VERSION:
+        raise ValueError('unsupported graph format version %d' % version)
+
+    layer_typecodes = mapped[_HEADER.size:_HEADER.size + layer_count]
+    if any(typecode not in _LAYER_TYPECODES for typecode in layer_typecodes):
+        raise ValueError('unknown mark layer type in %s' % path)
+
+    offset = _HEADER.size + layer_count
+    offset += -offset % _ITEM_SIZE
+    sections = []
+
+    for length in (vertex_count + 1, arc_count, vertex_count + 1, arc_count, arc_count):
+        sections.append(MappedArray(mapped, offset, VERTEX_TYPECODE, length))
+        offset += length * _ITEM_SIZE
+
+    layers = []
+    for typecode in layer_typecodes:
+        if typecode == 'n':
+            layers.append([None] * arc_count)
+        else:
+            layers.append(MappedArray(mapped, offset, typecode, arc_count))
+            offset += arc_count * _ITEM_SIZE
+
+    if offset != len(mapped):
+        raise ValueError('%s is truncated or corrupted' % path)
+
+    graph_type = FrozenUndirectedGraph if flags & FLAG_UNDIRECTED else FrozenGraph
+    offsets, targets, reversed_offsets, reversed_sources, reversed_arc_ids = sections
+    graph = graph_type(offsets, targets, layers[0], reversed_offsets, reversed_sources, reversed_arc_ids)
+
+    mark_collections = [ArcIndexedMarks(graph, values) for values in layers[1:]]
+
+    return graph, mark_collections
+
+
+GZIP_MAGIC = '\x1f\x8b'
+
+DimacsProblem = namedtuple('DimacsProblem', ['kind', 'graph', 'cost_marks', 'source', 'target', 'supplies'])
+
+
+def _open_text(path):
+    """open plain or gzip-compressed text file"""
+    with open(path, 'rb') as stream:
+        is_compressed = stream.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+    return gzip.open(path, 'rb') if is_compressed else open(path, 'rb')
+
+
+def _parse_number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+class _ArcBuffer(object):
+    """compact arc storage for streamed input: vertex indices and marks go to typed arrays"""
+    def __init__(self, has_marks=True):
+        self.sources = array.array(VERTEX_TYPECODE)
+        self.targets = array.array(VERTEX_TYPECODE)
+        self.marks = array.array('l') if has_marks else None
+
+    def append(self, v_from, v_to, mark=None):
+        self.sources.append(v_from)
+        self.targets.append(v_to)
+        if self.marks is not None:
+            try:
+                self.marks.append(mark)
+            except TypeError:  # the first non-integer mark - switch to floats
+                self.marks = array.array('d', self.marks)
+                self.marks.append(mark)
+
+    def build(self, graph_type, vertex_count):
+        return graph_type.from_edges(self.sources, self.targets, self.marks, vertex_count)
+
+
+def _get_graph_type(is_undirected, frozen):
+    if is_undirected:
+        return FrozenUndirectedGraph if frozen else UndirectedGraph
+    return FrozenGraph if frozen else Graph
+
+
+def read_edge_list(path, undirected=False, frozen=True, vertex_count=None, index_base=0):
+    """read whitespace separated "vertex_from vertex_to [mark]" lines, '#' and '%' start comments
+
+    Either every arc has a mark or none has. Multiple arcs are merged keeping the last mark.
+    """
+    arcs = None
+
+    with _open_text(path) as stream:
+        for line_idx, line in enumerate(stream):
+            fields = line.split()
+            if not fields or fields[0][0] in '#%':
+                continue
+            if len(fields) < 2:
+                raise ValueError('%s:%d: "vertex_from vertex_to [mark]" is expected' % (path, line_idx + 1))
+
+            has_mark = len(fields) > 2
+            if arcs is None:
+                arcs = _ArcBuffer(has_marks=has_mark)
+            elif has_mark != (arcs.marks is not None):
+                raise ValueError('%s:%d: %s' % (path, line_idx + 1, 'unexpected arc mark, the first arc has none'
+                                                if has_mark else 'arc mark is missing, the first arc has one'))
+            mark = _parse_number(fields[2]) if has_mark else None
+            arcs.append(int(fields[0]) - index_base, int(fields[1]) - index_base, mark)
+
+    arcs = arcs or _ArcBuffer(has_marks=False)
+    return arcs.build(_get_graph_type(undirected, frozen), vertex_count)
+
+
+def read_dimacs(path, frozen=True):
+    """read DIMACS shortest path ("p sp"), max flow ("p max") or min cost flow ("p min") problem
+
+    Vertices are renumbered from 0. Graph marks are arc lengths or capacities, min cost flow arc costs
+    go to cost_marks and vertex supplies (positive - source, negative - target) to supplies.
+    Multiple arcs are merged keeping the last one, non-zero lower capacity bounds are not supported.
+
+    :return DimacsProblem
+    """
+    kind, vertex_count = None, None
+    source, target, supplies = None, None, None
+    arcs, costs = None, None
+
+    with _open_text(path) as stream:
+        for line_idx, line in enumerate(stream):
+            fields = line.split()
+            if not fields or fields[0] == 'c':
+                continue
+
+            descriptor = fields[0]
+            if descriptor == 'p':
+                kind, vertex_count = fields[1], int(fields[2])
+                if kind not in ('sp', 'max', 'min'):
+                    raise ValueError('unsupported DIMACS problem "%s"' % kind)
+                arcs = _ArcBuffer()
+                if kind == 'min':
+                    costs = array.array('l')
+                    supplies = [0] * vertex_count
+            elif arcs is None:
+                raise ValueError('%s:%d: DIMACS problem line is expected first' % (path, line_idx + 1))
+            elif descriptor == 'a':
+                v_from, v_to = int(fields[1]) - 1, int(fields[2]) - 1
+                if kind == 'min':
+                    lower_bound, capacity, cost = map(_parse_number, fields[3:6])
+                    if lower_bound:
+                        raise ValueError('%s:%d: lower capacity bounds are not supported' % (path, line_idx + 1))
+                    arcs.append(v_from, v_to, capacity)
+                    try:
+                        costs.append(cost)
+                    except TypeError:
+                        costs = array.array('d', costs)
+                        costs.append(cost)
+                else:
+                    arcs.append(v_from, v_to, _parse_number(fields[3]))
+            elif descriptor == 'n':
+                vertex_idx = int(fields[1]) - 1
+                if kind == 'max':
+                    if fields[2] == 's':
+                        source = vertex_idx
+                    else:
+                        target = vertex_idx
+                elif kind == 'min':
+                    supplies[vertex_idx] = _parse_number(fields[2])
+            else:
+                raise ValueError('%s:%d: unknown DIMACS line "%s"' % (path, line_idx + 1, descriptor))
+
+    if arcs is None:
+        raise ValueError('%s has no DIMACS problem line' % path)
+
+    graph = arcs.build(_get_graph_type(False, frozen), vertex_count)
+
+    cost_marks = None
+    if costs is not None:
+        cost_marks = graph.get_mark_collection()
+        cost_marks.reset_marks(0)
+        for v_from, v_to, cost in itertools.izip(arcs.sources, arcs.targets, costs):
+            if v_from != v_to:
+                cost_marks.set_mark(v_from, v_to, cost)
+
+    return DimacsProblem(kind, graph, cost_marks, source, target, supplies)
+
+
+def read_matrix_market(path, frozen=True):
+    """read Matrix Market file
+
+    Coordinate matrix is read as a graph: entry (i, j) is an arc from row i - 1 to column j - 1,
+    symmetric matrix gives an undirected graph, pattern matrix gives arcs without marks.
+    Dense (array) matrix is read as a cost matrix (list of rows) as optimal_assignment and salesman expect.
+    """
+    with _open_text(path) as stream:
+        header = stream.readline().split()
+        if len(header) != 5 or header[0] != '%%MatrixMarket' or header[1] != 'matrix':
+            raise ValueError('%s is not a Matrix Market matrix' % path)
+
+        matrix_format, field, symmetry = header[2].lower(), header[3].lower(), header[4].lower()
+        if field == 'complex' or symmetry not in ('general', 'symmetric'):
+            raise ValueError('%s %s matrices are not supported' % (field, symmetry))
+
+        fields = None
+        for line in stream:
+            fields = line.split()
+            if fields and not fields[0].startswith('%'):
+                break
+
+        if not fields:
+            raise ValueError('%s has no matrix size line' % path)
+
+        row_count, col_count = int(fields[0]), int(fields[1])
+
+        if matrix_format == 'array':
+            # column-major order, only the lower triangle for symmetric matrices
+            matrix = [[None] * col_count for _ in xrange(row_count)]
+            col_idx, row_idx = 0, 0
+            for line in stream:
+                fields = line.split()
+                if not fields or fields[0].startswith('%'):
+                    continue
+                matrix[row_idx][col_idx] = _parse_number(fields[0])
+                if symmetry == 'symmetric':
+                    matrix[col_idx][row_idx] = matrix[row_idx][col_idx]
+                row_idx += 1
+                if row_idx == row_count:
+                    col_idx += 1
+                    row_idx = col_idx if symmetry == 'symmetric' else 0
+            return matrix
+
+        arcs = _ArcBuffer(has_marks=field != 'pattern')
+        for line in stream:
+            fields = line.split()
+            if not fields or fields[0].startswith('%'):
+                continue
+            mark = _parse_number(fields[2]) if arcs.marks is not None else None
+            arcs.append(int(fields[0]) - 1, int(fields[1]) - 1, mark)
+
+    vertex_count = max(row_count, col_count)
+    return arcs.build(_get_graph_type(symmetry == 'symmetric', frozen), vertex_count)
+
+
+class TestCase(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.graph')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_save_load(self):
+        graph = Graph(4)
+        cost_marks = ArcMarks()
+
+        graph.add(0, 1, 3)
+        graph.add(0, 2, 15)
+        graph.add(1, 2, 7)
+        graph.add(3, 1, 2)
+        cost_marks.set_mark(0, 1, 0.5)
+        cost_marks.set_mark(0, 2, 1.5)
+        cost_marks.set_mark(1, 2, 2.5)
+        cost_marks.set_mark(3, 1, 3.5)
+
+        save_graph(self.path, graph, cost_marks)
+        loaded_graph, (loaded_cost_marks,) = load_graph(self.path)
+
+        self.assertIsInstance(loaded_graph, FrozenGraph)
+        self.assertEqual(4, len(loaded_graph))
+        self.assertEqual([[1, 2], [2], [], [1]], [list(v_to_collection) for v_to_collection in loaded_graph])
+        self.assertEqual([0, 3], list(loaded_graph.get_backward(1)))
+        self.assertEqual(dict(graph.get_mark_collection()), dict(loaded_graph.get_mark_collection()))
+        self.assertEqual(dict(cost_marks), dict(loaded_cost_marks))
+
+        # mapped marks are read-only, a changed copy gets its own array
+        loaded_graph.set_mark(0, 1, 4)
+        self.assertEqual(4, loaded_graph.get_mark(0, 1))
+
+    def test_save_load_converted(self):
+        global _is_native
+        graph = Graph.from_edges([0, 0, 1, 3], [1, 2, 2, 1], [3, -15, 7, 1 << 40])
+        cost_marks = ArcMarks()
+        for v_from, v_to in ((0, 1), (0, 2), (1, 2), (3, 1)):
+            cost_marks.set_mark(v_from, v_to, v_to - v_from - 0.5)
+
+        native_is_native = _is_native
+        _is_native = lambda typecode: False  # as if typed arrays had another width or byte order
+        try:
+            save_graph(self.path, graph, cost_marks)
+            converted_graph, (converted_cost_marks,) = load_graph(self.path)
+
+            self.assertEqual([[1, 2], [2], [], [1]], [list(v_to_collection) for v_to_collection in converted_graph])
+            self.assertEqual(dict(graph.get_mark_collection()), dict(converted_graph.get_mark_collection()))
+            self.assertEqual(dict(cost_marks), dict(converted_cost_marks))
+        finally:
+            _is_native = native_is_native
+
+        native_graph, _ = load_graph(self.path)  # the file is the same either way
+        self.assertEqual(dict(graph.get_mark_collection()), dict(native_graph.get_mark_collection()))
+
+    def test_save_load_undirected(self):
+        graph = UndirectedGraph(3)
+
+        graph.add(0, 1)
+        graph.add(2, 1)
+
+        save_graph(self.path, graph)
+        loaded_graph, mark_collections = load_graph(self.path)
+
+        self.assertIsInstance(loaded_graph, UndirectedGraph)
+        self.assertEqual([], mark_collections)
+        self.assertEqual([0, 2], sorted(loaded_graph[1]))
+        self.assertIsNone(loaded_graph.get_mark(1, 2))
+
+        graph.set_mark(1, 0, 1)
+        graph.set_mark(2, 1, 7)
+        capacities = graph.get_mark_collection()
+        capacities.set_mark(2, 1, 70)
+        capacities.set_mark(0, 1, 10)
+
+        save_graph(self.path, graph, capacities)
+        loaded_graph, (loaded_capacities,) = load_graph(self.path)
+
+        self.assertEqual([1], list(loaded_graph.get_forward(2)))  # edges keep their direction
+        self.assertEqual(7, loaded_graph.get_mark(1, 2))
+        self.assertEqual(70, loaded_capacities.get_mark(1, 2))
+        self.assertEqual(10, loaded_capacities.get_mark(0, 1))
+
+    def _write(self, text, compress=False):
+        stream = gzip.open(self.path, 'wb') if compress else open(self.path, 'wb')
+        with stream:
+            stream.write(text)
+
+    def test_read_dimacs_max_flow(self):
+        from ford_fulkerson import ford_fulkerson
+
+        self._write('c max flow problem\n'
+                    'p max 6 10\n'
+                    'n 1 s\n'
+                    'n 6 t\n'
+                    'a 1 2 3\na 1 3 15\na 2 3 7\na 2 4 2\na 3 2 13\n'
+                    'a 3 5 5\na 4 3 1\na 4 6 20\na 5 4 3\na 5 6 4\n', compress=True)
+
+        problem = read_dimacs(self.path)
+        value, _, _ = ford_fulkerson(problem.graph, problem.source, problem.target)
+
+        self.assertEqual('max', problem.kind)
+        self.assertEqual(7, value)
+
+    def test_read_dimacs_min_cost_flow(self):
+        from min_cost_flow import min_cost_flow
+
+        self._write('p min 6 10\n'
+                    'n 1 7\n'
+                    'n 6 -7\n'
+                    'a 1 2 0 3 10\na 1 3 0 15 7\na 2 3 0 7 12\na 2 4 0 2 3\na 3 2 0 13 22\n'
+                    'a 3 5 0 5 16\na 4 3 0 1 1\na 4 6 0 20 20\na 5 4 0 3 14\na 5 6 0 4 31\n')
+
+        problem = read_dimacs(self.path, frozen=False)
+        source, target = problem.supplies.index(7), problem.supplies.index(-7)
+        max_flow, flow_cost, _ = min_cost_flow(problem.graph, problem.cost_marks, source, target)
+
+        self.assertEqual(7, max_flow)
+        self.assertEqual(339, flow_cost)
+
+    def test_read_edge_list(self):
+        from dijkstra import dijkstra
+
+        self._write('# from to length\n0 1 3\n0 2 15\n1 2 7\n1 3 2\n2 4 5\n3 2 1\n3 5 20\n4 3 3\n4 5 4\n',
+                    compress=True)
+
+        marks, _ = dijkstra(read_edge_list(self.path), 0)
+
+        self.assertListEqual([0, 3, 6, 5, 11, 15], marks)
+
+        for text in ('0 1 3\n1 2\n', '0 1\n1 2 7\n'):
+            self._write(text)
+            self.assertRaises(ValueError, read_edge_list, self.path)
+
+    def test_read_matrix_market(self):
+        from prim import prim
+
+        self._write('%%MatrixMarket matrix coordinate integer symmetric\n'
+                    '% complete graph\n'
+                    '5 5 10\n'
+                    '2 1 7\n3 1 3\n4 1 2\n5 1 6\n3 2 9\n4 2 4\n5 2 8\n4 3 4\n5 3 5\n5 4 5\n')
+
+        min_tree_weight, _ = prim(read_matrix_market(self.path))
+
+        self.assertEqual(14, min_tree_weight)
+
+        self._write('%%MatrixMarket matrix array real general\n2 2\n1\n3\n2.5\n4\n')
+
+        self.assertEqual([[1, 2.5], [3, 4]], read_matrix_market(self.path))
+
+    def test_bad_file(self):
+        with open(self.path, 'wb') as stream:
+            stream.write('not a graph at all, just some text')
+
+        self.assertRaises(ValueError, load_graph, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
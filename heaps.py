@@ -0,0 +1,361 @@
+
+import heapq
+import unittest
+import functools
+import collections
+
+
+class BinaryHeap(object):
+    """min-priority queue of vertices on heapq with lazy deletion
+
+    Pushing a queued vertex with a lower priority leaves its old entry in the heap, pop() skips such stale entries.
+    """
+    def __init__(self, vertex_count):
+        self._heap = []
+        self._priorities = [None] * vertex_count  # priority of queued vertices, None if not queued
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def get_priority(self, vertex):
+        return self._priorities[vertex]
+
+    def push(self, vertex, priority):
+        """insert vertex or decrease its priority, a higher priority is ignored"""
+        current_priority = self._priorities[vertex]
+        if current_priority is None:
+            self._size += 1
+        elif current_priority <= priority:
+            return
+
+        self._priorities[vertex] = priority
+        heapq.heappush(self._heap, (priority, vertex))
+
+    def pop(self):
+        """:return (vertex, priority) with the min priority"""
+        assert self._size, "Heap is empty"
+        priorities = self._priorities
+
+        while True:
+            priority, vertex = heapq.heappop(self._heap)
+            if priorities[vertex] == priority:
+                priorities[vertex] = None
+                self._size -= 1
+                return vertex, priority
+
+
+class IndexedDaryHeap(object):
+    """min-priority queue of vertices on an implicit d-ary heap with decrease-key
+
+    Every vertex is stored once, its heap position is tracked, so the heap never has more than |V| entries.
+    """
+    def __init__(self, vertex_count, arity=4):
+        assert arity >= 2
+        self._arity = arity
+        self._heap = []  # vertices
+        self._positions = [-1] * vertex_count  # position in the heap, -1 if not queued
+        self._priorities = [None] * vertex_count
+
+    def __len__(self):
+        return len(self._heap)
+
+    def get_priority(self, vertex):
+        return self._priorities[vertex] if self._positions[vertex] >= 0 else None
+
+    def push(self, vertex, priority):
+        """insert vertex or decrease its priority, a higher priority is ignored"""
+        position = self._positions[vertex]
+        if position < 0:
+            position = len(self._heap)
+            self._heap.append(vertex)
+        elif self._priorities[vertex] <= priority:
+            return
+
+        self._priorities[vertex] = priority
+        self._sift_up(vertex, position)
+
+    def pop(self):
+        """:return (vertex, priority) with the min priority"""
+        assert self._heap, "Heap is empty"
+        heap = self._heap
+
+        vertex = heap[0]
+        last_vertex = heap.pop()
+        if heap:
+            self._sift_down(last_vertex, 0)
+        self._positions[vertex] = -1
+
+        return vertex, self._priorities[vertex]
+
+    def _sift_up(self, vertex, position):
+        heap, positions, priorities, arity = self._heap, self._positions, self._priorities, self._arity
+        priority = priorities[vertex]
+
+        while position > 0:
+            parent_position = (position - 1) // arity
+            parent = heap[parent_position]
+            if priorities[parent] <= priority:
+                break
+            heap[position] = parent
+            positions[parent] = position
+            position = parent_position
+
+        heap[position] = vertex
+        positions[vertex] = position
+
+    def _sift_down(self, vertex, position):
+        heap, positions, priorities, arity = self._heap, self._positions, self._priorities, self._arity
+        priority = priorities[vertex]
+        size = len(heap)
+
+        while True:
+            first_child_position = position * arity + 1
+            if first_child_position >= size:
+                break
+
+            min_position = first_child_position
+            min_priority = priorities[heap[first_child_position]]
+            for child_position in xrange(first_child_position + 1, min(first_child_position + arity, size)):
+                child_priority = priorities[heap[child_position]]
+                if child_priority < min_priority:
+                    min_position, min_priority = child_position, child_priority
+
+            if priority <= min_priority:
+                break
+
+            child = heap[min_position]
+            heap[position] = child
+            positions[child] = position
+            position = min_position
+
+        heap[position] = vertex
+        positions[vertex] = position
+
+
+class ZeroOneQueue(object):
+    """monotone queue for 0-1 BFS: priorities pushed are the last popped one or one more
+
+    Deque with lazy deletion, a vertex goes to the front with the same priority and to the back otherwise.
+    """
+    def __init__(self, vertex_count):
+        self._deque = collections.deque()
+        self._priorities = [None] * vertex_count
+        self._last_priority = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def get_priority(self, vertex):
+        return self._priorities[vertex]
+
+    def push(self, vertex, priority):
+        """insert vertex or decrease its priority, a higher priority is ignored"""
+        current_priority = self._priorities[vertex]
+        if current_priority is None:
+            self._size += 1
+        elif current_priority <= priority:
+            return
+
+        self._priorities[vertex] = priority
+        if priority == self._last_priority:
+            self._deque.appendleft(vertex)
+        else:
+            assert self._last_priority is None or priority == self._last_priority + 1, "Arc weight isn't 0 or 1"
+            self._deque.append(vertex)
+
+    def pop(self):
+        """:return (vertex, priority) with the min priority"""
+        assert self._size, "Queue is empty"
+        priorities = self._priorities
+
+        while True:
+            vertex = self._deque.popleft()
+            priority = priorities[vertex]
+            if priority is not None:
+                priorities[vertex] = None
+                self._size -= 1
+                self._last_priority = priority
+                return vertex, priority
+
+
+class DialQueue(object):
+    """monotone bucket queue (Dial) for integer priorities at most max_weight above the last popped one
+
+    max_weight + 1 buckets are used circularly, a bucket holds vertices of a single priority, stale entries are skipped.
+    """
+    def __init__(self, vertex_count, max_weight):
+        assert max_weight >= 0
+        self._buckets = [[] for _ in xrange(max_weight + 1)]
+        self._priorities = [None] * vertex_count
+        self._current_priority = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def get_priority(self, vertex):
+        return self._priorities[vertex]
+
+    def push(self, vertex, priority):
+        """insert vertex or decrease its priority, a higher priority is ignored"""
+        current_priority = self._priorities[vertex]
+        if current_priority is None:
+            self._size += 1
+        elif current_priority <= priority:
+            return
+
+        assert self._current_priority <= priority < self._current_priority + len(self._buckets), \
+            "Priority is out of [last popped, last popped + max_weight]"
+
+        self._priorities[vertex] = priority
+        self._buckets[priority % len(self._buckets)].append(vertex)
+
+    def pop(self):
+        """:return (vertex, priority) with the min priority"""
+        assert self._size, "Queue is empty"
+        buckets, priorities = self._buckets, self._priorities
+        priority = self._current_priority
+
+        while True:
+            bucket = buckets[priority % len(buckets)]
+            while bucket:
+                vertex = bucket.pop()
+                if priorities[vertex] == priority:
+                    priorities[vertex] = None
+                    self._size -= 1
+                    self._current_priority = priority
+                    return vertex, priority
+            priority += 1
+
+
+class RadixHeap(object):
+    """monotone queue for non-negative integer priorities not less than the last popped one
+
+    Bucket i holds entries whose priority differs from the last popped one in the highest bit i - 1,
+    so each entry moves to lower buckets at most log(C) times.
+    """
+    def __init__(self, vertex_count):
+        self._buckets = [[]]  # (priority, vertex), grown on demand
+        self._priorities = [None] * vertex_count
+        self._last_priority = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def get_priority(self, vertex):
+        return self._priorities[vertex]
+
+    def _insert(self, vertex, priority):
+        bucket_idx = (priority ^ self._last_priority).bit_length()
+        while bucket_idx >= len(self._buckets):
+            self._buckets.append([])
+        self._buckets[bucket_idx].append((priority, vertex))
+
+    def push(self, vertex, priority):
+        """insert vertex or decrease its priority, a higher priority is ignored"""
+        current_priority = self._priorities[vertex]
+        if current_priority is None:
+            self._size += 1
+        elif current_priority <= priority:
+            return
+
+        assert priority >= self._last_priority, "Priority is less than the last popped one"
+        self._priorities[vertex] = priority
+        self._insert(vertex, priority)
+
+    def pop(self):
+        """:return (vertex, priority) with the min priority"""
+        assert self._size, "Heap is empty"
+        buckets, priorities = self._buckets, self._priorities
+
+        while True:
+            if not buckets[0]:
+                bucket_idx = next(idx for idx, bucket in enumerate(buckets) if bucket)
+                bucket = buckets[bucket_idx]
+                buckets[bucket_idx] = []
+
+                self._last_priority = min(bucket)[0]
+                for priority, vertex in bucket:
+                    self._insert(vertex, priority)
+
+            priority, vertex = buckets[0].pop()
+            if priorities[vertex] == priority:
+                priorities[vertex] = None
+                self._size -= 1
+                return vertex, priority
+
+
+DIAL_MAX_WEIGHT = 1 << 16  # larger weights use a radix heap instead of too many buckets
+
+
+def select_queue_type(max_weight=None):
+    """:return queue factory by vertex count for Dijkstra with marks known to be integers in [0, max_weight]"""
+    if max_weight is None:
+        return BinaryHeap
+    if max_weight <= 1:
+        return ZeroOneQueue
+    if max_weight <= DIAL_MAX_WEIGHT:
+        return functools.partial(DialQueue, max_weight=max_weight)
+    return RadixHeap
+
+
+class TestCase(unittest.TestCase):
+    def _check_order(self, heap):
+        priorities = [5, 3, 8, 1, 9, 7, 2]
+        for vertex, priority in enumerate(priorities):
+            heap.push(vertex, priority)
+
+        heap.push(4, 0)  # decrease
+        heap.push(3, 6)  # higher priority is ignored
+
+        self.assertEqual(len(priorities), len(heap))
+        self.assertEqual(0, heap.get_priority(4))
+
+        popped = [heap.pop() for _ in xrange(len(priorities))]
+
+        self.assertEqual([(4, 0), (3, 1), (6, 2), (1, 3), (0, 5), (5, 7), (2, 8)], popped)
+        self.assertEqual(0, len(heap))
+        self.assertIsNone(heap.get_priority(4))
+
+    def test_binary_heap(self):
+        self._check_order(BinaryHeap(7))
+
+    def test_indexed_dary_heap(self):
+        self._check_order(IndexedDaryHeap(7))
+        self._check_order(IndexedDaryHeap(7, arity=2))
+
+    def test_monotone_queues(self):
+        priorities = [5, 3, 8, 3, 9, 7, 4]
+
+        for heap in (DialQueue(7, max_weight=10), RadixHeap(7)):
+            for vertex, priority in enumerate(priorities):
+                heap.push(vertex, priority)
+            heap.push(4, 6)  # decrease
+            heap.push(0, 8)  # higher priority is ignored
+
+            popped = [heap.pop() for _ in xrange(4)]
+            heap.push(2, 6)
+            popped.extend(heap.pop() for _ in xrange(len(heap)))
+
+            self.assertEqual([3, 3, 4, 5, 6, 6, 7], [priority for _, priority in popped])
+            self.assertEqual({2, 4}, {vertex for vertex, priority in popped if priority == 6})
+            self.assertEqual(0, len(heap))
+
+    def test_zero_one_queue(self):
+        heap = ZeroOneQueue(4)
+        heap.push(0, 0)
+        self.assertEqual((0, 0), heap.pop())
+
+        heap.push(1, 1)
+        heap.push(2, 0)
+        heap.push(1, 0)  # decrease
+        heap.push(3, 1)
+
+        self.assertEqual([(1, 0), (2, 0), (3, 1)], [heap.pop() for _ in xrange(3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
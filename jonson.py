@@ -1,24 +1,30 @@
 
+import os
+import copy
+import heapq
+import array
+import random
 import unittest
+import tempfile
 
-from graph import Graph
-import graph_helper
+from graph import Graph, UndirectedGraph, ArcMarks
+import parallel_dijkstra
 
-from bellman_ford import bellman_ford
-from dijkstra import dijkstra
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from bellman_ford import spfa, vectorized_bellman_ford, bellman_ford
+from dijkstra import dijkstra, shortest_path, get_arc_marks_iterator
 
 
 def jonson(graph):
     assert isinstance(graph, Graph)
 
-    graph = graph.copy()
+    graph, potentials = _get_reweighted_graph(graph)  # now graph hasn't negative weights
     marks = []
 
-    potentials, has_negative_cycle = _compute_potentials(graph)
-    assert not has_negative_cycle, "Graph has cycle with negative weight"
-
-    _modify_arcs(graph, potentials)  # now graph hasn't negative weights
-
     for v_from in xrange(len(graph)):
         v_marks, _ = dijkstra(graph, v_from)
 
@@ -31,34 +37,228 @@ def jonson(graph):
     return marks
 
 
-def _compute_potentials(graph):
+def iter_jonson_rows(graph, sources=None, process_count=None, chunk_size=1):
+    """Johnson with Dijkstra searches on a process pool, rows are streamed in order of sources
+
+    :param sources: all vertices by default
+    :return iterator over (source, marks)
+    """
+    graph, potentials = _get_reweighted_graph(graph)
+    sources = xrange(len(graph)) if sources is None else sources
+    return parallel_dijkstra.iter_distance_rows(graph, sources, process_count, chunk_size, potentials)
+
+
+def write_jonson_matrix(graph, path, process_count=None, chunk_size=1):
+    """Johnson with Dijkstra searches on a process pool writing rows into a memory-mapped matrix, needs numpy
+
+    :return numpy.memmap |V| x |V| float64 distances, inf if there is no path
+    """
+    graph, potentials = _get_reweighted_graph(graph)
+    return parallel_dijkstra.write_distance_rows(graph, xrange(len(graph)), path, process_count, chunk_size,
+                                                 potentials)
+
+
+def _get_reweighted_graph(graph):
+    """:return (frozen graph sharing arcs with the given one with non-negative marks w(u, v) - p(u) + p(v),
+        potentials p)
+    """
     assert isinstance(graph, Graph)
+    graph = graph.freeze()
 
-    # add new source with arcs to all vertices
-    graph, new_source = graph_helper.add_new_source(graph, range(len(graph)), 0)
+    potentials, has_negative_cycle = _compute_potentials(graph)
+    assert not has_negative_cycle, "Graph has cycle with negative weight"
 
-    # now distance can be 0 or less than 0
-    marks, _, last_relaxed_vertices = bellman_ford(graph, new_source)
-    marks = marks[:new_source] + marks[new_source + 1:]  # exclude distance to added source
+    # new marks go to a side array, arcs of the frozen graph are shared
+    offsets, targets, reversed_offsets, reversed_sources, reversed_arc_ids = graph.get_csr_arrays()
+    marks = graph.get_mark_collection().values
+    reweighted_marks = array.array(marks.typecode) if hasattr(marks, 'typecode') else []
 
-    potentials = [-x for x in marks]  # potential is a negative distance
+    for v_from in xrange(len(graph)):
+        potential = potentials[v_from]
+        for arc_id in xrange(offsets[v_from], offsets[v_from + 1]):
+            reweighted_marks.append(marks[arc_id] - potential + potentials[targets[arc_id]])
+
+    reweighted_graph = type(graph)(offsets, targets, reweighted_marks,
+                                   reversed_offsets, reversed_sources, reversed_arc_ids)
+    return reweighted_graph, potentials
+
+
+class ReweightedGraph(Graph):
+    """directed view of a graph with non-negative reduced marks w(u, v) - p(u) + p(v)
+
+    Potentials p are computed once and kept feasible while arcs are changed through this view: a removed or
+    increased arc keeps them feasible, a decreased or added arc lowers distances from the virtual source by
+    a Dijkstra search limited to the vertices it improves. Any Dijkstra-based search works on the view,
+    dijkstra() and shortest_path() here return marks of the original graph.
+    """
+    def __init__(self, graph):
+        assert isinstance(graph, Graph)
+        self._graph = graph
+
+        self._potentials, has_negative_cycle = _compute_potentials(graph)
+        assert not has_negative_cycle, "Graph has cycle with negative weight"
+
+    @property
+    def base_graph(self):
+        return self._graph
+
+    @property
+    def potentials(self):
+        return self._potentials
+
+    @property
+    def version(self):
+        return self._graph.version  # potentials change only with the base graph
+
+    @property
+    def arc_count(self):
+        return self._graph.arc_count * (2 if isinstance(self._graph, UndirectedGraph) else 1)
+
+    def __iter__(self):
+        for vertex_idx in xrange(self.vertex_count):
+            yield self.get_forward(vertex_idx)
+
+    @property
+    def vertex_count(self):
+        return len(self._graph)
+
+    def get_forward(self, vertex_idx):
+        if isinstance(self._graph, UndirectedGraph):
+            return self._graph.get_adjacent(vertex_idx)
+        return self._graph.get_forward(vertex_idx)
+
+    def get_backward(self, vertex_idx):
+        if isinstance(self._graph, UndirectedGraph):
+            return self._graph.get_adjacent(vertex_idx)
+        return self._graph.get_backward(vertex_idx)
+
+    def has(self, vertex_from, vertex_to):
+        return self._graph.has(vertex_from, vertex_to)
+
+    def iter_forward_marks(self, vertex_idx):
+        potentials = self._potentials
+        potential = potentials[vertex_idx]
+        for v_to, weight in self._graph.iter_arc_marks(vertex_idx):
+            yield v_to, weight - potential + potentials[v_to]
+
+    def iter_backward_marks(self, vertex_idx):
+        potentials = self._potentials
+        potential = potentials[vertex_idx]
+        for v_from, weight in get_arc_marks_iterator(self._graph, reverse=True)(vertex_idx):
+            yield v_from, weight - potentials[v_from] + potential
+
+    def iter_arc_marks(self, vertex_idx):
+        return self.iter_forward_marks(vertex_idx)
+
+    def get_mark_collection(self):
+        """:return ArcMarks with reduced marks"""
+        marks = ArcMarks()
+        for v_from in xrange(self.vertex_count):
+            for v_to, mark in self.iter_forward_marks(v_from):
+                marks.set_mark(v_from, v_to, mark)
+        return marks
+
+    def get_mark(self, vertex_from, vertex_to):
+        weight = self._graph.get_mark(vertex_from, vertex_to)
+        if weight is None:
+            return None
+        return weight - self._potentials[vertex_from] + self._potentials[vertex_to]
+
+    def set_mark(self, vertex_from, vertex_to, value):
+        self._update_potentials(vertex_from, vertex_to, value)
+        self._graph.set_mark(vertex_from, vertex_to, value)
+
+    def add(self, vertex_from, vertex_to, value=None):
+        assert value is not None
+        self._update_potentials(vertex_from, vertex_to, value)
+        self._graph.add(vertex_from, vertex_to, value)
 
-    has_negative_cycle = bool(last_relaxed_vertices)
+    def remove(self, vertex_from, vertex_to):
+        self._graph.remove(vertex_from, vertex_to)
 
-    return potentials, has_negative_cycle
+    def add_vertex(self):
+        self._potentials.append(0)  # stand-alone vertex
+        return self._graph.add_vertex()
 
+    def copy(self):
+        """:return ReweightedGraph over a copy of the base graph"""
+        graph = copy.copy(self)
+        graph._graph = self._graph.copy()
+        graph._potentials = list(self._potentials)
+        return graph
 
-def _modify_arcs(graph, potentials):
+    def clone(self):
+        return self.copy()
+
+    def _update_potentials(self, vertex_from, vertex_to, weight):
+        """lower potentials for the changed arc, for both arcs of an undirected edge"""
+        if isinstance(self._graph, UndirectedGraph):
+            if weight < 0:  # the edge is a negative cycle of its two arcs
+                raise ValueError('edge (%d, %d) with mark %r makes a negative cycle' % (vertex_from, vertex_to, weight))
+            self._lower_potentials(vertex_to, vertex_from, weight)
+        self._lower_potentials(vertex_from, vertex_to, weight)
+
+    def _lower_potentials(self, vertex_from, vertex_to, weight):
+        """keep reduced marks non-negative after the arc gets the weight, the graph isn't changed yet"""
+        potentials = self._potentials
+        reduced_weight = weight - potentials[vertex_from] + potentials[vertex_to]
+        if reduced_weight >= 0:
+            return
+
+        # distance from the virtual source to x decreases by -(reduced_weight + d(vertex_to, x)) if positive,
+        # d(vertex_to, x) is the distance by reduced marks
+        marks, settled_marks = {vertex_to: 0}, {}
+        queue = [(0, vertex_to)]
+
+        while queue:
+            v_mark, v_from = heapq.heappop(queue)
+            if v_mark + reduced_weight >= 0:
+                break
+            if v_from in settled_marks:
+                continue  # stale queue entry
+            if v_from == vertex_from:
+                raise ValueError('arc (%d, %d) with mark %r makes a negative cycle' % (vertex_from, vertex_to, weight))
+
+            settled_marks[v_from] = v_mark
+            for v_to, mark in self.iter_forward_marks(v_from):
+                new_mark = v_mark + mark
+                if v_to not in settled_marks and (v_to not in marks or marks[v_to] > new_mark):
+                    marks[v_to] = new_mark
+                    heapq.heappush(queue, (new_mark, v_to))
+
+        for vertex, mark in settled_marks.iteritems():
+            potentials[vertex] -= reduced_weight + mark  # potential is a negative distance
+
+    def _restore_marks(self, source, marks):
+        potentials = self._potentials
+        return [mark + potentials[source] - potentials[v_to] if mark is not None else None
+                for v_to, mark in enumerate(marks)]
+
+    def dijkstra(self, source):
+        """:return (marks, prev_vertex_marks) by marks of the base graph"""
+        marks, prev_vertex_marks = dijkstra(self, source)
+        return self._restore_marks(source, marks), prev_vertex_marks
+
+    def shortest_path(self, source, target):
+        """:return (distance, path) by marks of the base graph, (None, []) if target isn't reachable"""
+        distance, path = shortest_path(self, source, target)
+        if distance is None:
+            return None, []
+        return distance + self._potentials[source] - self._potentials[target], path
+
+
+def _compute_potentials(graph):
     assert isinstance(graph, Graph)
-    assert len(graph) == len(potentials)
 
-    for v_from in xrange(len(graph)):
-        for v_to in graph.get_forward(v_from):
-            weight = graph.get_mark(v_from, v_to)
-            new_weight = weight - potentials[v_from] + potentials[v_to]
-            graph.set_mark(v_from, v_to, new_weight)
+    # distances from a virtual source with zero arcs to all vertices, they can be 0 or less than 0
+    search = vectorized_bellman_ford if numpy is not None else spfa
+    marks, _, negative_cycle = search(graph, None)
+    if negative_cycle:
+        return None, True  # search stopped at the cycle, marks aren't final
 
-    return graph
+    potentials = [-x for x in marks]  # potential is a negative distance
+
+    return potentials, False
 
 
 class TestCase(unittest.TestCase):
@@ -87,6 +287,93 @@ class TestCase(unittest.TestCase):
         for v_from in xrange(len(graph)):
             self.assertListEqual(marks[v_from], expected_marks[v_from])
 
+        rows = list(iter_jonson_rows(graph, [4, 0], process_count=2))
+        self.assertListEqual([(4, expected_marks[4]), (0, expected_marks[0])], rows)
+
+        if numpy is not None:
+            handle, path = tempfile.mkstemp(suffix='.distances')
+            os.close(handle)
+            try:
+                distances = write_jonson_matrix(graph, path, process_count=2)
+
+                self.assertListEqual(expected_marks, [[int(mark) if mark != numpy.inf else None for mark in row]
+                                                      for row in distances])
+                del distances
+            finally:
+                os.remove(path)
+
+    def test_reweighted_graph(self):
+        rnd = random.Random(59)
+        heights = [rnd.randint(0, 20) for _ in xrange(30)]
+        graph = Graph(30)
+        for _ in xrange(100):
+            v_from, v_to = rnd.randrange(30), rnd.randrange(30)
+            graph.add(v_from, v_to, rnd.randint(0, 10) + heights[v_to] - heights[v_from])  # no negative cycles
+
+        reweighted_graph = ReweightedGraph(graph)
+        change_count = 0
+
+        for _ in xrange(100):
+            v_from, v_to = rnd.randrange(30), rnd.randrange(30)
+            if v_from == v_to:
+                continue
+
+            try:
+                if graph.has(v_from, v_to) and rnd.random() < 0.2:
+                    reweighted_graph.remove(v_from, v_to)
+                else:
+                    reweighted_graph.add(v_from, v_to, rnd.randint(-10, 10))
+                change_count += 1
+            except ValueError:
+                continue  # change would make a negative cycle, graph isn't changed
+
+            self.assertTrue(all(mark >= 0 for _, mark in reweighted_graph.get_mark_collection().iteritems()))
+
+            for source in (0, v_from):
+                expected_marks, _, negative_cycle = bellman_ford(graph, source)
+                marks, _ = reweighted_graph.dijkstra(source)
+
+                self.assertListEqual([], negative_cycle)
+                self.assertListEqual(expected_marks, marks)
+                self.assertEqual(expected_marks[v_to], reweighted_graph.shortest_path(source, v_to)[0])
+
+        self.assertGreater(change_count, 50)
+
+    def test_reweighted_undirected_graph(self):
+        graph = UndirectedGraph(3)
+        graph.add(0, 1, 10)
+        graph.add(1, 2, 3)
+
+        reweighted_graph = ReweightedGraph(graph)
+
+        self.assertRaises(ValueError, reweighted_graph.set_mark, 0, 1, -1)
+        self.assertEqual(10, graph.get_mark(0, 1))
+
+        rnd = random.Random(61)
+        graph = UndirectedGraph(20)
+        for _ in xrange(50):
+            graph.add(rnd.randrange(20), rnd.randrange(20), rnd.randint(0, 20))
+
+        reweighted_graph = ReweightedGraph(graph)
+
+        for _ in xrange(50):
+            v_from, v_to = rnd.randrange(20), rnd.randrange(20)
+            if v_from == v_to:
+                continue
+
+            try:
+                reweighted_graph.add(v_from, v_to, rnd.randint(-2, 20))
+            except ValueError:
+                continue
+
+            self.assertTrue(all(mark >= 0 for _, mark in reweighted_graph.get_mark_collection().iteritems()))
+
+            expected_marks, _, negative_cycle = bellman_ford(graph, v_to)
+            marks, _ = reweighted_graph.dijkstra(v_to)
+
+            self.assertListEqual([], negative_cycle)
+            self.assertListEqual(expected_marks, marks)
+
 
 if __name__ == '__main__':
     unittest.main()
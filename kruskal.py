@@ -0,0 +1,81 @@
+
+import random
+import unittest
+from graph import Graph, UndirectedGraph
+
+from disjoint_set import DisjointSet
+from prim import prim
+
+
+def kruskal(graph):
+    """minimum spanning forest, arcs of a directed graph are taken as edges
+
+    :return (weight, edges) as prim does
+    """
+    assert isinstance(graph, Graph)
+
+    edges = sorted(_iter_edges(graph))
+    vertex_sets = DisjointSet(len(graph))
+
+    min_tree_weight = 0
+    tree_edges = []
+
+    for weight, v_from, v_to in edges:
+        if vertex_sets.union(v_from, v_to):
+            tree_edges.append((v_from, v_to))
+            min_tree_weight += weight
+
+            if vertex_sets.set_count == 1:
+                break
+
+    return min_tree_weight, tree_edges
+
+
+def _iter_edges(graph):
+    """iterate (weight, vertex_from, vertex_to) over edges, every edge of an undirected graph once"""
+    if isinstance(graph, UndirectedGraph):
+        for v_from, v_to in graph.iter_arcs():
+            yield graph.get_mark(v_from, v_to), v_from, v_to
+    else:
+        for v_from in xrange(len(graph)):
+            for v_to, weight in graph.iter_forward_marks(v_from):
+                yield weight, v_from, v_to
+
+
+class TestCase(unittest.TestCase):
+    def test_simple(self):
+        graph = UndirectedGraph(5)
+
+        graph.add(0, 1, 7)
+        graph.add(0, 2, 3)
+        graph.add(0, 3, 2)
+        graph.add(0, 4, 6)
+        graph.add(1, 2, 9)
+        graph.add(1, 3, 4)
+        graph.add(1, 4, 8)
+        graph.add(2, 3, 4)
+        graph.add(2, 4, 5)
+        graph.add(3, 4, 5)
+
+        min_tree_weight, tree_edges = kruskal(graph)
+
+        self.assertEqual(14, min_tree_weight)
+        self.assertEqual(4, len(tree_edges))
+
+    def test_random(self):
+        rnd = random.Random(61)
+        graph = UndirectedGraph(50)
+        for v_to in xrange(1, 50):
+            graph.add(rnd.randrange(v_to), v_to, rnd.randint(1, 100))  # connected
+        for _ in xrange(200):
+            graph.add(rnd.randrange(50), rnd.randrange(50), rnd.randint(1, 100))
+
+        for checked_graph in (graph, graph.freeze()):
+            min_tree_weight, tree_edges = kruskal(checked_graph)
+
+            self.assertEqual(prim(graph)[0], min_tree_weight)
+            self.assertEqual(min_tree_weight, sum(graph.get_mark(v_from, v_to) for v_from, v_to in tree_edges))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,10 @@
 
 import unittest
-from copy import deepcopy
 
 from graph import Graph, ArcMarks
 from graph_helper import ARC_FLOW_LIMIT
 
-from bellman_ford import bellman_ford
+from bellman_ford import spfa
 
 
 def min_cost_flow(graph, cost_marks, source, target):
@@ -17,14 +16,26 @@ def min_cost_flow(graph, cost_marks, source, target):
     original_graph = graph
     original_cost_marks = cost_marks
 
-    graph = graph.copy()
-    cost_marks = deepcopy(cost_marks)
+    # mutable copy even if the original graph is frozen
+    graph = Graph(len(original_graph))
+    for v_from in xrange(len(original_graph)):
+        for v_to, max_arc_flow in original_graph.iter_forward_marks(v_from):
+            graph.add(v_from, v_to, max_arc_flow)
 
     # add backward arcs with zero capacity and opposite cost
     for v_from, v_to_collection in enumerate(original_graph):
         for v_to in v_to_collection:
             graph.add(v_to, v_from, 0)
 
+    # arcs get indices, all marks below are arrays by arc index
+    graph = graph.freeze()
+
+    cost_marks = graph.get_mark_collection()
+    cost_marks.reset_marks(0)
+
+    for (v_from, v_to), cost in original_cost_marks.iteritems():
+        cost_marks.set_mark(v_from, v_to, cost)
+
     for (v_from, v_to), cost in original_cost_marks.iteritems():
         cost_marks.set_mark(v_to, v_from, -cost)
 
@@ -32,25 +43,24 @@ def min_cost_flow(graph, cost_marks, source, target):
     flow_marks = graph.get_mark_collection()
     flow_marks.reset_marks(0)  # set zero flow
 
-    rest_flow_graph = graph.copy()  # graph to update weights during iteration
+    rest_flow_graph = graph.copy()  # graph to update weights during iteration, shares arcs with graph
 
     max_flow, flow_cost = 0, 0
     is_done = False
 
     while not is_done:
         # create rest flow graph (arcs with weight = (cost - flow))
-        for v_from, v_to_collection in enumerate(graph):
-            for v_to in v_to_collection:
-                max_arc_flow = graph.get_mark(v_from, v_to)
-                current_flow = flow_marks[(v_from, v_to)]
-                arc_exists = (max_arc_flow != current_flow)
+        for arc_id in xrange(graph.arc_count):
+            max_arc_flow = graph.get_arc_mark(arc_id)
+            current_flow = flow_marks.get_arc_mark(arc_id)
+            arc_exists = (max_arc_flow != current_flow)
 
-                weight = cost_marks[(v_from, v_to)] if arc_exists else ARC_FLOW_LIMIT
-                rest_flow_graph.set_mark(v_from, v_to, weight)
+            weight = cost_marks.get_arc_mark(arc_id) if arc_exists else ARC_FLOW_LIMIT
+            rest_flow_graph.set_arc_mark(arc_id, weight)
 
-        marks, prev_vertex_marks, last_relaxed_vertices = bellman_ford(rest_flow_graph, source)
+        marks, prev_vertex_marks, negative_cycle = spfa(rest_flow_graph, source)
 
-        assert not last_relaxed_vertices, "Intermediate graph has cycles with negative weight"
+        assert not negative_cycle, "Intermediate graph has cycles with negative weight"
 
         min_path_length = marks[target]
 
@@ -60,8 +70,9 @@ def min_cost_flow(graph, cost_marks, source, target):
             curr_vertex, prev_vertex = target, prev_vertex_marks[target]
 
             while prev_vertex is not None:
-                max_arc_flow = graph.get_mark(prev_vertex, curr_vertex)
-                current_flow = flow_marks[(prev_vertex, curr_vertex)]
+                arc_id = graph.get_arc_id(prev_vertex, curr_vertex)
+                max_arc_flow = graph.get_arc_mark(arc_id)
+                current_flow = flow_marks.get_arc_mark(arc_id)
                 possible_extra_flow = max_arc_flow - current_flow
                 extra_flow = min(extra_flow, possible_extra_flow)
                 curr_vertex, prev_vertex = prev_vertex, prev_vertex_marks[prev_vertex]
@@ -72,9 +83,11 @@ def min_cost_flow(graph, cost_marks, source, target):
             curr_vertex, prev_vertex = target, prev_vertex_marks[target]
 
             while prev_vertex is not None:
-                arc_cost = cost_marks[(prev_vertex, curr_vertex)]
-                flow_marks[(prev_vertex, curr_vertex)] += extra_flow
-                flow_marks[(curr_vertex, prev_vertex)] -= extra_flow  # for paired arc
+                arc_id = graph.get_arc_id(prev_vertex, curr_vertex)
+                paired_arc_id = graph.get_arc_id(curr_vertex, prev_vertex)
+                arc_cost = cost_marks.get_arc_mark(arc_id)
+                flow_marks.set_arc_mark(arc_id, flow_marks.get_arc_mark(arc_id) + extra_flow)
+                flow_marks.set_arc_mark(paired_arc_id, flow_marks.get_arc_mark(paired_arc_id) - extra_flow)
                 flow_cost += arc_cost * extra_flow
                 curr_vertex, prev_vertex = prev_vertex, prev_vertex_marks[prev_vertex]
         else:
@@ -0,0 +1,168 @@
+
+import os
+import random
+import unittest
+import tempfile
+import contextlib
+import multiprocessing
+
+from graph import Graph, UndirectedGraph
+import graph_io
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from dijkstra import dijkstra, shortest_path
+
+_worker_graph = None  # graph mapped by a pool worker
+_worker_potentials = None
+_worker_distances = None  # distance matrix mapped by a pool worker
+
+
+def _init_pool_worker(path, initializer, initargs):
+    if path is not None:
+        graph, _ = graph_io.load_graph(path)
+        initargs = (graph,) + tuple(initargs)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+@contextlib.contextmanager
+def worker_pool(process_count=None, initializer=None, initargs=(), graph=None):
+    """process pool terminated on exit, by an error too
+
+    If graph is given, it is saved to a temporary file mapped by every worker (pages are shared, nothing
+    is pickled) and the mapped graph is passed to initializer before initargs.
+
+    :param process_count: pool size, number of CPUs by default
+    """
+    path, pool = None, None
+
+    try:
+        if graph is not None:
+            assert isinstance(graph, Graph)
+            handle, path = tempfile.mkstemp(suffix='.graph')
+            os.close(handle)
+            graph_io.save_graph(path, graph)
+
+        pool = multiprocessing.Pool(process_count, _init_pool_worker, (path, initializer, initargs))
+        yield pool
+        pool.close()
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        if path is not None:
+            os.remove(path)
+
+
+def _init_worker(graph, potentials=None, distances_path=None):
+    global _worker_graph, _worker_potentials, _worker_distances
+    _worker_graph = graph
+    _worker_potentials = potentials
+
+    if distances_path is not None:
+        vertex_count = len(_worker_graph)
+        _worker_distances = numpy.memmap(distances_path, dtype=numpy.float64, mode='r+',
+                                         shape=(vertex_count, vertex_count))
+
+
+def _compute_row(source):
+    marks, _ = dijkstra(_worker_graph, source)
+
+    if _worker_potentials is not None:
+        # graph marks are reduced by potentials: w(u, v) - p(u) + p(v)
+        potentials = _worker_potentials
+        marks = [mark + potentials[source] - potentials[v_to] if mark is not None else None
+                 for v_to, mark in enumerate(marks)]
+
+    return source, marks
+
+
+def _store_row(source):
+    _, marks = _compute_row(source)
+    _worker_distances[source] = [mark if mark is not None else numpy.inf for mark in marks]
+    return source
+
+
+def _compute_pair(pair):
+    source, target = pair
+    distance, path = shortest_path(_worker_graph, source, target)
+    return source, target, distance, path
+
+
+def _iter_results(graph, function, tasks, process_count, chunk_size, potentials=None, distances_path=None):
+    """:return iterator over function results in order of tasks, computed by workers mapping the graph"""
+    with worker_pool(process_count, _init_worker, (potentials, distances_path), graph) as pool:
+        for result in pool.imap(function, tasks, chunk_size):
+            yield result
+
+
+def iter_distance_rows(graph, sources, process_count=None, chunk_size=1, potentials=None):
+    """Dijkstra from many sources on a process pool, rows are streamed in order of sources
+
+    :param process_count: pool size, number of CPUs by default
+    :param potentials: vertex potentials graph marks are reduced by (w(u, v) - p(u) + p(v)), marks are
+        restored to the original ones
+    :return iterator over (source, marks) with marks as returned by dijkstra
+    """
+    return _iter_results(graph, _compute_row, sources, process_count, chunk_size, potentials)
+
+
+def write_distance_rows(graph, sources, path, process_count=None, chunk_size=1, potentials=None):
+    """Dijkstra from many sources on a process pool, workers write rows straight into a memory-mapped
+    |V| x |V| float64 matrix, inf if there is no path. Rows of other vertices stay inf. Needs numpy.
+
+    :return numpy.memmap with distances
+    """
+    assert numpy is not None, "numpy is required"
+
+    distances = numpy.memmap(path, dtype=numpy.float64, mode='w+', shape=(len(graph), len(graph)))
+    distances.fill(numpy.inf)
+    distances.flush()
+
+    for _ in _iter_results(graph, _store_row, sources, process_count, chunk_size, potentials, path):
+        pass
+
+    return distances
+
+
+def iter_shortest_paths(graph, pairs, process_count=None, chunk_size=16):
+    """point-to-point shortest paths for many (source, target) pairs on a process pool
+
+    :return iterator over (source, target, distance, path) in order of pairs, as returned by shortest_path
+    """
+    return _iter_results(graph, _compute_pair, pairs, process_count, chunk_size)
+
+
+class TestCase(unittest.TestCase):
+    def setUp(self):
+        rnd = random.Random(5)
+        self.graph = Graph(40)
+        for _ in xrange(160):
+            self.graph.add(rnd.randrange(40), rnd.randrange(40), rnd.randint(0, 30))
+
+    def test_distance_rows(self):
+        sources = [3, 0, 17, 39, 3]
+        rows = list(iter_distance_rows(self.graph, sources, process_count=2))
+
+        self.assertListEqual(sources, [source for source, _ in rows])
+        for source, marks in rows:
+            self.assertListEqual(dijkstra(self.graph, source)[0], marks)
+
+    def test_shortest_paths(self):
+        graph = UndirectedGraph(4)
+        graph.add(0, 1, 2)
+        graph.add(1, 2, 3)
+        graph.add(0, 2, 7)
+
+        pairs = [(0, 2), (2, 0), (0, 3)]
+        results = list(iter_shortest_paths(graph, pairs, process_count=2))
+
+        self.assertListEqual([(0, 2, 5, [0, 1, 2]), (2, 0, 5, [2, 1, 0]), (0, 3, None, [])], results)
+
+
+if __name__ == '__main__':
+    unittest.main()
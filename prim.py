@@ -1,10 +1,18 @@
 
+import random
 import unittest
 import heapq
 from graph import Graph, UndirectedGraph
+from heaps import IndexedDaryHeap
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 def prim(graph):
+    """:return (weight, edges) of the minimum spanning tree, of a spanning forest if graph isn't connected"""
     assert isinstance(graph, Graph)
 
     min_tree_weight = 0
@@ -12,35 +20,121 @@ def prim(graph):
     edges_to_discover = []
     discovered = [False] * len(graph)
 
-    v_from = 0
-    discovered[v_from] = True
+    for root in xrange(len(graph)):  # every undiscovered vertex starts a new tree
+        if discovered[root]:
+            continue
+
+        v_from = root
+        discovered[v_from] = True
 
-    # first condition is added to enumerate edges from start vertex as from any other one
-    while v_from == 0 or not all(discovered):
-        # add incident edges that help to discover some vertices
-        for v_to in graph[v_from]:
-            if not discovered[v_to]:
-                edge_weight = graph.get_mark(v_from, v_to)
-                # edges will be sorted by weight (then by v_from and v_to) automatically
-                heapq.heappush(edges_to_discover, (edge_weight, v_from, v_to))
+        while True:
+            # add incident edges that help to discover some vertices
+            for v_to, edge_weight in graph.iter_arc_marks(v_from):
+                if not discovered[v_to]:
+                    # edges will be sorted by weight (then by v_from and v_to) automatically
+                    heapq.heappush(edges_to_discover, (edge_weight, v_from, v_to))
 
-        if not edges_to_discover:
-            break
+            # drop edges between discovered vertices
+            while edges_to_discover and discovered[edges_to_discover[0][1]] and discovered[edges_to_discover[0][2]]:
+                heapq.heappop(edges_to_discover)
 
-        # find edge with min. weight from discovered vertex to an undiscovered one
-        min_weight, min_v_from, min_v_to = heapq.heappop(edges_to_discover)
+            if not edges_to_discover:
+                break
 
-        while discovered[min_v_from] and discovered[min_v_to]:
+            # find edge with min. weight from discovered vertex to an undiscovered one
             min_weight, min_v_from, min_v_to = heapq.heappop(edges_to_discover)
 
-        # update
-        # only one is discovered
-        v_from = min_v_to if discovered[min_v_from] else min_v_from
-        discovered[v_from] = True
-        tree_edges.append((min_v_from, min_v_to))
-        min_tree_weight += min_weight
+            # update
+            # only one is discovered
+            v_from = min_v_to if discovered[min_v_from] else min_v_from
+            discovered[v_from] = True
+            tree_edges.append((min_v_from, min_v_to))
+            min_tree_weight += min_weight
+
+    return min_tree_weight, tree_edges
+
+
+def indexed_prim(graph, queue_type=IndexedDaryHeap):
+    """Prim with a decrease-key queue of vertices by the lightest edge to the tree, |V| queue entries at most
+
+    :return (weight, edges) as prim does
+    """
+    assert isinstance(graph, Graph)
+
+    min_tree_weight = 0
+    tree_edges = []
+    discovered = [False] * len(graph)
+    tree_vertex_marks = [None] * len(graph)  # tree end of the lightest edge to the vertex
+
+    queue = queue_type(len(graph))
+
+    for root in xrange(len(graph)):  # every undiscovered vertex starts a new tree
+        if discovered[root]:
+            continue
+        queue.push(root, 0)
+
+        while queue:
+            v_from, edge_weight = queue.pop()
+            discovered[v_from] = True
+
+            if tree_vertex_marks[v_from] is not None:
+                tree_edges.append((tree_vertex_marks[v_from], v_from))
+                min_tree_weight += edge_weight
+
+            for v_to, weight in graph.iter_arc_marks(v_from):
+                if not discovered[v_to]:
+                    current_weight = queue.get_priority(v_to)
+                    if current_weight is None or current_weight > weight:
+                        tree_vertex_marks[v_to] = v_from
+                        queue.push(v_to, weight)
+
+    return min_tree_weight, tree_edges
+
+
+def dense_prim(matrix, no_edge=None):
+    """O(|V|^2) Prim over a symmetric distance matrix, one vectorized update per added vertex, needs numpy
+
+    :param matrix: numpy array or list of rows, None, nan and inf mean no edge
+    :param no_edge: one more value meaning no edge, e.g. salesman.MAX_COST
+    :return (weight, edges) as prim does, of a spanning forest if graph isn't connected
+    """
+    assert numpy is not None, "numpy is required"
+
+    matrix = numpy.asarray(matrix)  # numpy arrays aren't copied, rows are cleaned one by one
+    if matrix.dtype == object:
+        matrix = numpy.asarray(matrix, dtype=numpy.float64)  # None becomes nan
+    assert matrix.ndim == 2 and matrix.shape[0] == matrix.shape[1]
+
+    vertex_count = len(matrix)
+    min_weights = numpy.full(vertex_count, numpy.inf)  # lightest edge to the tree
+    tree_vertices = numpy.full(vertex_count, -1, dtype=numpy.int64)  # its tree end
+    is_discovered = numpy.zeros(vertex_count, dtype=bool)
+
+    min_tree_weight = 0
+    tree_edges = []
+
+    for _ in xrange(vertex_count):
+        vertex = int(numpy.argmin(numpy.where(is_discovered, numpy.inf, min_weights)))
+        if is_discovered[vertex] or not numpy.isfinite(min_weights[vertex]):
+            vertex = int(numpy.argmin(is_discovered))  # no edges to the tree, new tree starts
+
+        is_discovered[vertex] = True
+        if tree_vertices[vertex] >= 0 and numpy.isfinite(min_weights[vertex]):
+            tree_edges.append((int(tree_vertices[vertex]), vertex))
+            min_tree_weight += min_weights[vertex]
+
+        row = numpy.array(matrix[vertex], dtype=numpy.float64)  # a copy, the matrix isn't changed
+        row[numpy.isnan(row)] = numpy.inf
+        if no_edge is not None:
+            row[row == no_edge] = numpy.inf
+
+        is_closer = ~is_discovered & (row < min_weights)
+        min_weights[is_closer] = row[is_closer]
+        tree_vertices[is_closer] = vertex
+
+    if float(min_tree_weight).is_integer():
+        min_tree_weight = int(min_tree_weight)
 
-    assert all(discovered), "Graph has stand-alone vertices"
     return min_tree_weight, tree_edges
 
 
@@ -64,6 +158,64 @@ class TestCase(unittest.TestCase):
 
         self.assertEqual(expected_min_weight, min_tree_weight)
 
+        min_tree_weight, tree_edges = indexed_prim(graph)
+
+        self.assertEqual(expected_min_weight, min_tree_weight)
+        self.assertEqual(4, len(tree_edges))
+
+    def test_random(self):
+        rnd = random.Random(67)
+        graph = UndirectedGraph(60)
+        for v_to in xrange(1, 60):
+            graph.add(rnd.randrange(v_to), v_to, rnd.randint(1, 100))  # connected
+        for _ in xrange(300):
+            graph.add(rnd.randrange(60), rnd.randrange(60), rnd.randint(1, 100))
+
+        min_tree_weight, tree_edges = indexed_prim(graph)
+
+        self.assertEqual(prim(graph)[0], min_tree_weight)
+        self.assertEqual(min_tree_weight, sum(graph.get_mark(v_from, v_to) for v_from, v_to in tree_edges))
+
+    def test_forest(self):
+        graph = UndirectedGraph(6)
+
+        graph.add(0, 4, 3)
+        graph.add(4, 2, 1)
+        graph.add(0, 2, 5)
+        graph.add(1, 3, 7)
+
+        for search in (prim, indexed_prim):
+            min_tree_weight, tree_edges = search(graph)
+
+            self.assertEqual(11, min_tree_weight)
+            self.assertEqual(3, len(tree_edges))
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_dense(self):
+        rnd = random.Random(73)
+        points = [(rnd.random(), rnd.random()) for _ in xrange(40)]
+        matrix = [[int(1000 * ((x_from - x_to) ** 2 + (y_from - y_to) ** 2) ** 0.5) for x_to, y_to in points]
+                  for x_from, y_from in points]
+
+        graph = UndirectedGraph(len(points))
+        for v_from in xrange(len(points)):
+            for v_to in xrange(v_from):
+                graph.add(v_from, v_to, matrix[v_from][v_to])
+
+        min_tree_weight, tree_edges = dense_prim(matrix)
+
+        self.assertEqual(prim(graph)[0], min_tree_weight)
+        self.assertEqual(min_tree_weight, sum(matrix[v_from][v_to] for v_from, v_to in tree_edges))
+
+        matrix = [[0, 2, None], [2, 0, None], [None, None, 0]]
+        self.assertEqual((2, [(0, 1)]), dense_prim(matrix))
+
+        matrix = numpy.array([[0, 2, numpy.nan], [2, 0, 99], [numpy.nan, 99, 0]])
+        matrix_copy = matrix.copy()
+
+        self.assertEqual((2, [(0, 1)]), dense_prim(matrix, no_edge=99))
+        self.assertTrue(numpy.allclose(matrix_copy, matrix, equal_nan=True))  # caller's matrix isn't changed
+
 
 if __name__ == '__main__':
     unittest.main()
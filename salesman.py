@@ -1,6 +1,5 @@
 
 import unittest
-from copy import deepcopy
 
 import heapq
 from functools import total_ordering
@@ -77,7 +76,7 @@ class Vertex(object):
         return graph_helper.has_cycle(graph)
 
     def build_path(self):
-        arcs = deepcopy(self.positions)
+        arcs = list(self.positions)  # arcs are immutable tuples
         vertex_in, vertex_out = [False] * self.size, [False] * self.size
 
         for arc in arcs:
@@ -107,7 +106,7 @@ class Vertex(object):
 
     def copy(self):
         """:return Vertex"""
-        return deepcopy(self)
+        return Vertex([list(row) for row in self.matrix], self.value, list(self.positions))
 
     @property
     def size(self):
@@ -194,7 +193,7 @@ class Vertex(object):
 def tsp_branch_and_bound(cost_matrix):
     # work correctly for maxtrices with size > 2
     branch_vertices = []
-    vertex = Vertex(deepcopy(cost_matrix))
+    vertex = Vertex([list(row) for row in cost_matrix])
     vertex.simplify()
     heapq.heappush(branch_vertices, vertex)
 
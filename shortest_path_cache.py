@@ -0,0 +1,126 @@
+
+import sys
+import unittest
+import collections
+
+from graph import Graph
+from dijkstra import dijkstra
+
+
+def _get_result_size(result):
+    """:return approximate memory size of nested lists/tuples of numbers in bytes"""
+    if isinstance(result, (list, tuple)):
+        return sys.getsizeof(result) + sum(_get_result_size(item) for item in result)
+    return sys.getsizeof(result) if result is not None else 0
+
+
+class ShortestPathCache(object):
+    """LRU cache of single-source results keyed by (graph id, graph version, source)
+
+    Any change of a graph changes its version, so results of older versions are never returned, they are
+    evicted as least recently used. Cached results are shared between callers and must not be changed.
+    """
+    def __init__(self, max_size=64 << 20, compute=dijkstra):
+        """
+        :param max_size: approximate memory limit of cached results in bytes
+        :param compute: function(graph, source) -> result, e.g. dijkstra or bellman_ford
+        """
+        self._max_size = max_size
+        self._compute = compute
+        self._results = collections.OrderedDict()  # key -> (result, size), least recently used first
+        self._size = 0
+        self.hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+
+    @property
+    def size(self):
+        """:return approximate memory size of cached results in bytes"""
+        return self._size
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, graph, source):
+        """:return cached result for the current graph version, computed on a miss"""
+        assert isinstance(graph, Graph)
+        key = (id(graph), graph.version, source)
+
+        entry = self._results.pop(key, None)
+        if entry is not None:
+            self.hit_count += 1
+            self._results[key] = entry  # move to the most recently used end
+            return entry[0]
+
+        self.miss_count += 1
+        result = self._compute(graph, source)
+        result_size = _get_result_size(result)
+
+        if result_size <= self._max_size:
+            while self._size + result_size > self._max_size:
+                _, (_, evicted_size) = self._results.popitem(last=False)
+                self._size -= evicted_size
+                self.eviction_count += 1
+
+            self._results[key] = (result, result_size)
+            self._size += result_size
+
+        return result
+
+    def clear(self):
+        self._results.clear()
+        self._size = 0
+
+    def get_stats(self):
+        """:return dict with hit/miss/eviction counts, entry count and memory size"""
+        return {
+            'hit_count': self.hit_count,
+            'miss_count': self.miss_count,
+            'eviction_count': self.eviction_count,
+            'entry_count': len(self._results),
+            'size': self._size,
+        }
+
+
+class TestCase(unittest.TestCase):
+    def test_simple(self):
+        graph = Graph(4)
+        graph.add(0, 1, 3)
+        graph.add(1, 2, 4)
+        graph.add(0, 2, 9)
+
+        cache = ShortestPathCache()
+        marks, _ = cache.get(graph, 0)
+
+        self.assertEqual([0, 3, 7, None], marks)
+        self.assertIs(marks, cache.get(graph, 0)[0])
+
+        graph.set_mark(0, 2, 5)
+        marks, _ = cache.get(graph, 0)
+
+        self.assertEqual([0, 3, 5, None], marks)
+        self.assertEqual((1, 2), (cache.hit_count, cache.miss_count))
+
+    def test_eviction(self):
+        graph = Graph(10)
+        for v_from in xrange(10):
+            graph.add(v_from, (v_from + 1) % 10, 1)  # every row has the same size
+
+        cache = ShortestPathCache()
+        cache.get(graph, 0)
+        result_size = cache.size
+
+        cache = ShortestPathCache(max_size=2 * result_size)
+        for source in (0, 1, 0, 2, 1, 0):
+            cache.get(graph, source)
+
+        stats = cache.get_stats()
+
+        self.assertEqual(2, stats['entry_count'])
+        self.assertEqual(3, stats['eviction_count'])  # 1 evicted by 2, 0 by 1, 2 by 0
+        self.assertEqual((1, 5), (stats['hit_count'], stats['miss_count']))
+        self.assertEqual(2 * result_size, stats['size'])
+
+
+if __name__ == '__main__':
+    unittest.main()
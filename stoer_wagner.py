@@ -1,32 +1,77 @@
 
+import random
 import unittest
+import itertools
 
 import graph_helper
 from graph import UndirectedGraph
-
-from prim import prim
+from heaps import IndexedDaryHeap
 
 
 def stoer_wagner(graph):
+    """global minimum cut of an undirected graph with non-negative marks
+
+    Every phase orders vertices by maximum adjacency (the next vertex is the most tightly connected to the
+    vertices taken before it) with a max-priority queue. The last vertex gives a cut of the phase, then it's
+    merged into the previous one in place: adjacency maps of merged vertices are summed up.
+
+    :return (weight, vertices of one side of the cut)
+    """
     assert isinstance(graph, UndirectedGraph)
 
-    graph = graph.copy()
-    min_cut = graph_helper.ARC_COST_LIMIT  # max possible
+    adjacent = [{} for _ in xrange(len(graph))]  # merged vertex -> sum of edge weights
+    for v_from in xrange(len(graph)):
+        for v_to, weight in graph.iter_arc_marks(v_from):
+            adjacent[v_from][v_to] = weight
+
+    members = [[vertex] for vertex in xrange(len(graph))]  # original vertices of merged ones
+    active_vertices = set(xrange(len(graph)))
+
+    min_cut, min_cut_vertices = graph_helper.ARC_COST_LIMIT, []  # max possible
+
+    while len(active_vertices) > 1:
+        # maximum adjacency order, priorities are negated connection weights
+        queue = IndexedDaryHeap(len(graph))
+        for vertex in active_vertices:
+            queue.push(vertex, 0)
+
+        taken_vertices = set()
+        prev_vertex = last_vertex = None
+        cut_weight = 0
+
+        while queue:
+            vertex, priority = queue.pop()
+            taken_vertices.add(vertex)
+            prev_vertex, last_vertex, cut_weight = last_vertex, vertex, -priority
 
-    for _ in xrange(len(graph) - 1):
-        _, spanning_tree_edges = prim(graph)
-        heaviest_edge = spanning_tree_edges[-1]  # it's supposed to be so
+            for v_to, weight in adjacent[vertex].iteritems():
+                if v_to not in taken_vertices:
+                    queue.push(v_to, queue.get_priority(v_to) - weight)
 
         # cut weight is sum of edges adjacent to last joined vertex
-        v_last_joined = heaviest_edge[1]
-        cut_weight = sum(graph.get_mark(v, v_last_joined) for v in graph.get_adjacent(v_last_joined))
+        if cut_weight < min_cut:
+            min_cut, min_cut_vertices = cut_weight, list(members[last_vertex])
 
-        min_cut = min(min_cut, cut_weight)
+        _merge(adjacent, prev_vertex, last_vertex)
+        members[prev_vertex].extend(members[last_vertex])
+        members[last_vertex] = None
+        active_vertices.remove(last_vertex)
 
-        # flip the heaviest edge and merge incident vertices
-        graph = graph_helper.merge_vertices(graph, *heaviest_edge)
+    return min_cut, sorted(min_cut_vertices)
 
-    return min_cut
+
+def _merge(adjacent, vertex, merged_vertex):
+    """merge adjacency map of the merged vertex into the vertex one"""
+    vertex_adjacent = adjacent[vertex]
+    vertex_adjacent.pop(merged_vertex, None)
+
+    for v_to, weight in adjacent[merged_vertex].iteritems():
+        if v_to != vertex:
+            del adjacent[v_to][merged_vertex]
+            new_weight = vertex_adjacent.get(v_to, 0) + weight
+            vertex_adjacent[v_to] = adjacent[v_to][vertex] = new_weight
+
+    adjacent[merged_vertex] = None
 
 
 class TestCase(unittest.TestCase):
@@ -39,8 +84,28 @@ class TestCase(unittest.TestCase):
         graph.add(1, 3, 6)
         graph.add(2, 3, 5)
 
-        value = stoer_wagner(graph)
+        value, vertices = stoer_wagner(graph)
 
         expected_value = 11  # (0, 1, 2) & 3
 
         self.assertEqual(value, expected_value)
+        self.assertIn(vertices, ([3], [0, 1, 2]))
+
+    def test_random(self):
+        rnd = random.Random(79)
+
+        for _ in xrange(10):
+            graph = UndirectedGraph(8)
+            for _ in xrange(16):
+                graph.add(rnd.randrange(8), rnd.randrange(8), rnd.randint(1, 10))
+
+            def _get_cut_weight(vertices):
+                return sum(graph.get_mark(v_from, v_to) for v_from in vertices
+                           for v_to in graph.get_adjacent(v_from) if v_to not in vertices)
+
+            expected_value = min(_get_cut_weight(set(vertices)) for size in xrange(1, 8)
+                                 for vertices in itertools.combinations(xrange(8), size))
+            value, vertices = stoer_wagner(graph)
+
+            self.assertEqual(expected_value, value)
+            self.assertEqual(expected_value, _get_cut_weight(set(vertices)))